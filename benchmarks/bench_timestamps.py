@@ -0,0 +1,60 @@
+"""Micro-benchmark of the readTime decoder against the per-row strptime path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_timestamps
+"""
+from __future__ import annotations
+
+import datetime
+import timeit
+
+from custom_components.stromnetz_graz.timestamps import decode_timestamps
+
+ROWS = 35_040  # one year of quarter hour readings
+
+
+def strptime_read_time(read_time: str) -> float:
+    """The previous Reading.readTime implementation."""
+    if read_time[-1] == "Z":
+        return (
+            datetime.datetime.strptime(read_time, "%Y-%m-%dT%H:%M:%SZ")
+            .replace(tzinfo=datetime.timezone.utc)
+            .timestamp()
+        )
+    return datetime.datetime.strptime(read_time, "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+
+
+def sample(fmt: str) -> list[str]:
+    start = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    offset = datetime.timezone(datetime.timedelta(hours=1))
+    values = []
+    for i in range(ROWS):
+        time = start + datetime.timedelta(minutes=15 * i)
+        if fmt == "Z":
+            values.append(time.strftime("%Y-%m-%dT%H:%M:%SZ"))
+        else:
+            values.append(time.astimezone(offset).isoformat(timespec="milliseconds"))
+    return values
+
+
+def main() -> None:
+    for fmt in ("Z", "offset"):
+        values = sample(fmt)
+        expected = [strptime_read_time(v) for v in values]
+        assert list(decode_timestamps(values)) == expected
+
+        old = min(
+            timeit.repeat(
+                lambda: [strptime_read_time(v) for v in values], number=1, repeat=5
+            )
+        )
+        new = min(timeit.repeat(lambda: decode_timestamps(values), number=1, repeat=5))
+        print(
+            f"{fmt:>6}: strptime {old * 1000:7.1f} ms  decoder {new * 1000:7.1f} ms"
+            f"  speedup {old / new:4.1f}x  ({ROWS} rows)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Benchmarks of the hot paths of the integration against the stub portal.
+
+Run from the repository root:
+
+    python -m benchmarks.run --save bench.json
+    python -m benchmarks.run --baseline bench.json
+
+With --baseline every benchmark is compared with the saved result and the run
+fails if one of them got slower than the tolerance allows.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Sized
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+from homeassistant.util.json import json_loads
+
+from custom_components.stromnetz_graz import aggregate
+from custom_components.stromnetz_graz.api import (
+    Reading,
+    ReadingResponse,
+    StromNetzGrazAPI,
+)
+from custom_components.stromnetz_graz.hub import Coordianator
+from custom_components.stromnetz_graz.transport import Transport
+
+from .stub_portal import PortalConfig, StubPortal, start_portal
+
+UTC = datetime.timezone.utc
+
+
+class Result:
+    """Timings, or with unit "B" retained bytes, of one benchmark."""
+
+    def __init__(
+        self,
+        name: str,
+        timings: list[float],
+        rows: int,
+        note: str = "",
+        unit: str = "s",
+    ):
+        self.name = name
+        self.timings = timings
+        self.rows = rows
+        self.note = note
+        self.unit = unit
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.timings)
+
+    def as_dict(self) -> dict:
+        return {
+            "median": self.median,
+            "timings": self.timings,
+            "rows": self.rows,
+            "unit": self.unit,
+        }
+
+
+async def measure(
+    name: str,
+    func: Callable[[], Awaitable[int]],
+    repeat: int,
+    note: str = "",
+) -> Result:
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = await func()
+        timings.append(time.perf_counter() - start)
+    return Result(name, timings, rows, note)
+
+
+def measure_memory(name: str, build: Callable[[], Sized]) -> Result:
+    """Measure the memory still allocated by the result of build.
+
+    Everything build allocates and drops again, e.g. the decoded JSON, only
+    shows up in the peak.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result: Any = build()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rows = len(result)
+    note = f"{retained / rows:.0f} B/row, peak {peak / 1024:.0f} KB"
+    return Result(name, [retained], rows, note, unit="B")
+
+
+async def run(repeat: int, latency: float, years: float) -> list[Result]:
+    results = []
+
+    # CPU bound parts on one year of quarter hour data of one meter
+    portal = StubPortal(PortalConfig(years=1))
+    year = portal.readings(
+        1001, portal.since, portal.config.now, datetime.timedelta(minutes=15)
+    )
+    data = {"intervalType": "QuarterHourly", "readings": year}
+
+    payload = json.dumps(data).encode()
+
+    async def decode() -> int:
+        return len(json_loads(payload)["readings"])
+
+    results.append(await measure("decode_year", decode, repeat))
+
+    async def parse() -> int:
+        return len(ReadingResponse(data, UTC))
+
+    results.append(await measure("parse_year", parse, repeat))
+
+    hass = HomeAssistant(tempfile.mkdtemp())
+    coordinator = Coordianator(hass, None)
+    valid = (
+        ReadingResponse(data, UTC)
+        .filter("MR")
+        .filter(keep=("Valid",), skip=("NotAvailable", "Estimated"))
+    )
+
+    async def hourly() -> int:
+        starts, _ = aggregate.hourly(valid.times, valid.values, 3600)
+        return len(starts)
+
+    results.append(await measure("hourly_year", hourly, repeat))
+
+    starts, values = aggregate.hourly(valid.times, valid.values, 3600)
+
+    async def daily() -> int:
+        days, _ = aggregate.rollup(starts, values, UTC, "day")
+        months, _ = aggregate.rollup(starts, values, UTC, "month")
+        return len(days) + len(months)
+
+    results.append(await measure("rollup_year", daily, repeat))
+
+    # memory held by one year of readings in the different representations
+    results.append(
+        measure_memory(
+            "memory_response", lambda: ReadingResponse(json_loads(payload), UTC)
+        )
+    )
+    results.append(
+        measure_memory(
+            "memory_meter_values",
+            lambda: ReadingResponse(json_loads(payload), UTC).meterReadingValues,
+        )
+    )
+    results.append(
+        measure_memory(
+            "memory_readings",
+            lambda: [Reading(r) for r in json_loads(payload)["readings"]],
+        )
+    )
+
+    # I/O bound parts against the stub portal
+    config = PortalConfig(years=years, latency=latency)
+    portal, runner, url = await start_portal(config)
+    try:
+        async with aiohttp.ClientSession() as session:
+
+            async def backfill() -> int:
+                api = StromNetzGrazAPI("bench", "bench", session, host=url)
+                reading = await api.get_readings(
+                    1001, portal.since, datetime.datetime.now(UTC)
+                )
+                return len(reading)
+
+            requests_before = sum(portal.requests.values())
+            results.append(
+                await measure(
+                    "backfill",
+                    backfill,
+                    repeat,
+                    f"{years} years, {latency * 1000:.0f} ms latency",
+                )
+            )
+            requests = (sum(portal.requests.values()) - requests_before) // repeat
+            results[-1].note += f", {requests} requests"
+
+            async def incremental() -> int:
+                api = StromNetzGrazAPI("bench", "bench", session, host=url)
+                now = datetime.datetime.now(UTC)
+                reading = await api.get_readings(
+                    1001, now - datetime.timedelta(days=3), now
+                )
+                window = coordinator._window_statistics(reading, None)
+                return len(window.statistics)
+
+            results.append(await measure("incremental_sync", incremental, repeat))
+    finally:
+        await runner.cleanup()
+
+    # a portal that serves two requests at a time and fails some of them
+    config = PortalConfig(
+        years=years, latency=latency, error_rate=0.05, max_concurrency=2
+    )
+    portal, runner, url = await start_portal(config)
+    try:
+        async with aiohttp.ClientSession() as session:
+            retries = []
+
+            async def throttled() -> int:
+                api = StromNetzGrazAPI("bench", "bench", session, host=url)
+                reading = await api.get_readings(
+                    1001, portal.since, datetime.datetime.now(UTC)
+                )
+                retries.append(api.metrics.counters.get("retries", 0))
+                return len(reading)
+
+            results.append(
+                await measure(
+                    "throttled_backfill", throttled, repeat, "5% errors, 2 concurrent"
+                )
+            )
+            results[-1].note += (
+                f", {statistics.mean(retries):.0f} retries, {portal.throttled} 429s"
+            )
+    finally:
+        await runner.cleanup()
+
+    # the integration's own session against a portal that compresses
+    config = PortalConfig(years=years, latency=latency, compress=True)
+    portal, runner, url = await start_portal(config)
+    transport = Transport(hass)
+    try:
+
+        async def transport_backfill() -> int:
+            api = StromNetzGrazAPI("bench", "bench", host=url, transport=transport)
+            reading = await api.get_readings(
+                1001, portal.since, datetime.datetime.now(UTC)
+            )
+            return len(reading)
+
+        results.append(
+            await measure("transport_backfill", transport_backfill, repeat, "gzip")
+        )
+        counters = transport.metrics.counters
+        results[-1].note += (
+            f", {transport.as_dict()['compression_ratio']}x smaller, "
+            f"{counters.get('connections_reused', 0)} reused / "
+            f"{counters.get('connections_new', 0)} new connections"
+        )
+    finally:
+        await transport.async_close()
+        await runner.cleanup()
+        await hass.async_stop(force=True)
+
+    return results
+
+
+def report(results: list[Result], baseline: dict | None, tolerance: float) -> bool:
+    """Print the results, return False if a benchmark regressed."""
+    ok = True
+    print(f"{'benchmark':<19} {'median':>10} {'rows':>8}  notes")
+    for result in results:
+        if result.unit == "B":
+            median = f"{result.median / 1024:>8.0f}KB"
+        else:
+            median = f"{result.median * 1000:>8.1f}ms"
+        line = f"{result.name:<19} {median} {result.rows:>8}"
+        notes = [result.note] if result.note else []
+        if baseline and result.name in baseline:
+            previous = baseline[result.name]["median"]
+            change = result.median / previous - 1
+            notes.append(f"{change:+.0%} vs baseline")
+            if change > tolerance:
+                notes.append("REGRESSION")
+                ok = False
+        print(f"{line}  {'; '.join(notes)}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--baseline", help="compare with this json file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.repeat, args.latency, args.years))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    ok = report(results, baseline, args.tolerance)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({r.name: r.as_dict() for r in results}, file, indent=2)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
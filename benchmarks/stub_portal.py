@@ -0,0 +1,266 @@
+"""Local stand-in for the Stromnetz Graz web portal API.
+
+Serves /login, /getInstallations and /getMeterReading with synthetic but
+realistic data: multi-year quarter hour series with mixed Valid, Estimated and
+NotAvailable readings. Latency, error rate and the number of concurrent
+requests served before answering 429 are configurable.
+
+Run standalone from the repository root:
+
+    python -m benchmarks.stub_portal --port 8080 --latency 0.2 --error-rate 0.05
+
+and point StromNetzGrazAPI(host="http://localhost:8080") at it.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime
+import random
+import warnings
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+UTC = datetime.timezone.utc
+
+# the stub compresses large bodies in the event loop on purpose, like a proxy
+warnings.filterwarnings("ignore", "Synchronous compression", UserWarning)
+QUARTER_HOUR = datetime.timedelta(minutes=15)
+
+
+@dataclass
+class PortalConfig:
+    """Behaviour of the stub portal."""
+
+    years: float = 3.0
+    meter_point_ids: tuple[int, ...] = (1001, 1002)
+    # seconds added to every request
+    latency: float = 0.0
+    # share of getMeterReading requests answered with a 500
+    error_rate: float = 0.0
+    # getMeterReading requests served at the same time, more are answered with
+    # a 429 and Retry-After; 0 serves all
+    max_concurrency: int = 0
+    retry_after: int = 1
+    # compress the responses as the client accepts, like the portal's proxy
+    compress: bool = False
+    # share of NotAvailable readings in the history
+    not_available_rate: float = 0.002
+    # readings of the last days are Estimated until they are validated
+    estimated_days: int = 2
+    # readings of the last hours are not available yet
+    not_available_hours: int = 12
+    now: datetime.datetime = field(
+        default_factory=lambda: datetime.datetime.now(UTC).replace(
+            minute=0, second=0, microsecond=0
+        )
+    )
+    token: str = "stub-token"
+    seed: int = 1
+
+
+class StubPortal:
+    """Synthetic readings and the request handlers of the stub portal."""
+
+    def __init__(self, config: PortalConfig | None = None) -> None:
+        self.config = config or PortalConfig()
+        self.random = random.Random(self.config.seed)
+        self.since = self.config.now - datetime.timedelta(
+            days=365 * self.config.years
+        )
+        self.requests: dict[str, int] = {}
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.throttled = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/login", self.login)
+        app.router.add_post("/getInstallations", self.installations)
+        app.router.add_post("/getMeterReading", self.meter_reading)
+        return app
+
+    async def _begin(self, request: web.Request) -> None:
+        self.requests[request.path] = self.requests.get(request.path, 0) + 1
+        if self.config.latency:
+            await asyncio.sleep(self.config.latency)
+
+    def _authorized(self, request: web.Request) -> bool:
+        return request.headers.get("Authorization") == f"Bearer {self.config.token}"
+
+    def _json(self, data) -> web.Response:
+        response = web.json_response(data)
+        self.bytes_sent += len(response.body)
+        if self.config.compress:
+            response.enable_compression()
+        return response
+
+    async def login(self, request: web.Request) -> web.Response:
+        await self._begin(request)
+        body = await request.json()
+        if not body.get("email") or not body.get("password"):
+            return self._json({"success": False, "error": "invalid credentials"})
+        return self._json({"success": True, "token": self.config.token, "error": ""})
+
+    async def installations(self, request: web.Request) -> web.Response:
+        await self._begin(request)
+        if not self._authorized(request):
+            return web.Response(status=401)
+        meter_points = [
+            {
+                "meterPointID": meter_point_id,
+                "name": f"AT00000000000000000000000000{meter_point_id}",
+                "shortName": f"Meter {meter_point_id}",
+                "readingsAvailableSince": self.since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "meterType": "IMS",
+            }
+            for meter_point_id in self.config.meter_point_ids
+        ]
+        return self._json(
+            [
+                {
+                    "installationID": 1,
+                    "installationNumber": 100001,
+                    "customerID": 1,
+                    "customerNumber": 200001,
+                    "address": "Stubgasse 1, 8010 Graz",
+                    "deliveryDirection": "Consumption",
+                    "meterPoints": meter_points,
+                }
+            ]
+        )
+
+    async def meter_reading(self, request: web.Request) -> web.Response:
+        limit = self.config.max_concurrency
+        if limit and self.in_flight >= limit:
+            self.requests[request.path] = self.requests.get(request.path, 0) + 1
+            self.throttled += 1
+            return web.Response(
+                status=429, headers={"Retry-After": str(self.config.retry_after)}
+            )
+
+        self.in_flight += 1
+        try:
+            await self._begin(request)
+            if not self._authorized(request):
+                return web.Response(status=401)
+            if self.random.random() < self.config.error_rate:
+                return web.Response(status=500)
+            return self._readings_response(await request.json())
+        finally:
+            self.in_flight -= 1
+
+    def _readings_response(self, body: dict) -> web.Response:
+        start = datetime.datetime.fromisoformat(body["fromDate"]).astimezone(UTC)
+        end = datetime.datetime.fromisoformat(body["toDate"]).astimezone(UTC)
+        step = QUARTER_HOUR
+        if body["interval"] != "QuarterHourly":
+            step = datetime.timedelta(days=1)
+        return self._json(
+            {
+                "intervalType": body["interval"],
+                "readings": self.readings(body["meterPointId"], start, end, step),
+            }
+        )
+
+    def value(self, meter_point_id: int, time: datetime.datetime) -> float:
+        """Meter reading in kWh, a smooth daily profile on top of a base load."""
+        hours = (time - self.since).total_seconds() / 3600
+        return round(meter_point_id % 7 * 100 + hours * 0.45 + (hours % 24) * 0.01, 3)
+
+    def state(self, meter_point_id: int, time: datetime.datetime) -> str:
+        age = self.config.now - time
+        if age < datetime.timedelta(hours=self.config.not_available_hours):
+            return "NotAvailable"
+        if age < datetime.timedelta(days=self.config.estimated_days):
+            return "Estimated"
+        # deterministic per meter and time, so repeated requests agree
+        draw = hash((meter_point_id, time.timestamp())) % 100_000
+        if draw < self.config.not_available_rate * 100_000:
+            return "NotAvailable"
+        return "Valid"
+
+    def readings(
+        self,
+        meter_point_id: int,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        step: datetime.timedelta,
+    ) -> list[dict]:
+        time = max(start, self.since)
+        # align to the interval
+        offset = (time - self.since) % step
+        if offset:
+            time += step - offset
+        end = min(end, self.config.now)
+
+        readings = []
+        while time < end:
+            state = self.state(meter_point_id, time)
+            value = None
+            if state != "NotAvailable":
+                value = self.value(meter_point_id, time)
+            readings.append(
+                {
+                    "readTime": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "readingValues": [
+                        {
+                            "scale": "",
+                            "readingType": "MR",
+                            "value": value,
+                            "unit": "KWH",
+                            "readingState": state,
+                        },
+                        {
+                            "scale": "",
+                            "readingType": "CONSUMP",
+                            "value": None if value is None else 0.112,
+                            "unit": "KWH",
+                            "readingState": state,
+                        },
+                    ],
+                }
+            )
+            time += step
+        return readings
+
+
+async def start_portal(
+    config: PortalConfig | None = None, port: int = 0
+) -> tuple[StubPortal, web.AppRunner, str]:
+    """Start the stub portal on localhost and return it with its runner and url."""
+    portal = StubPortal(config)
+    runner = web.AppRunner(portal.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    sockets = site._server.sockets  # pylint: disable=protected-access
+    url = f"http://127.0.0.1:{sockets[0].getsockname()[1]}"
+    return portal, runner, url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+
+    portal = StubPortal(
+        PortalConfig(
+            years=args.years,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            max_concurrency=args.max_concurrency,
+            compress=args.compress,
+        )
+    )
+    web.run_app(portal.app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,19 @@
 """The example sensor integration."""
 from __future__ import annotations
-from homeassistant.core import HomeAssistant
-from .const import DOMAIN
+from homeassistant.core import HomeAssistant, callback
+from datetime import timedelta
+from homeassistant.helpers.event import async_track_time_interval
+from .const import (
+    CONF_QUARTER_HOUR_DAYS,
+    DEFAULT_QUARTER_HOUR_DAYS,
+    DOMAIN,
+    GAP_RETRY_INTERVAL,
+)
 from homeassistant.config_entries import ConfigEntry
-from .api import StromNetzGrazAPI
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from .api import InstallationsResponse
+from .client import async_acquire_api, async_release_api
 from .hub import Coordianator, meter_factory, Hub
+from .installations import async_get_installations
 import logging
 
 PLATFORMS: list[str] = ["sensor"]
@@ -15,21 +23,70 @@ _LOGGER = logging.getLogger(__name__)
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     _LOGGER.info("Setting up Stromnetz Graz")
 
-    api = StromNetzGrazAPI(entry.data["email"], entry.data["password"], async_get_clientsession(hass))
-    coordinator = Coordianator(hass, api)
-    meters = await meter_factory(api, entry.data["installation"], coordinator)
-    coordinator.meters = meters
-    MeterHub = Hub(api, coordinator, meters)
+    api = await async_acquire_api(hass, entry)
+    try:
+        coordinator = Coordianator(
+            hass,
+            api,
+            entry.options.get(CONF_QUARTER_HOUR_DAYS, DEFAULT_QUARTER_HOUR_DAYS),
+        )
 
-    await coordinator.async_config_entry_first_refresh()
+        installationID = entry.data["installation"]
+
+        @callback
+        def installations_refreshed(installations: InstallationsResponse) -> None:
+            # new or removed meters need new entities
+            installation = installations.installation(installationID)
+            if installation is None:
+                return
+            if set(installation.meter_points_by_id) != {m.meter_id for m in meters}:
+                _LOGGER.info("Meters of %s changed, reloading", entry.title)
+                hass.async_create_task(
+                    hass.config_entries.async_reload(entry.entry_id)
+                )
+
+        installations = await async_get_installations(
+            hass, api, installations_refreshed
+        )
+        meters = meter_factory(installations, installationID, coordinator)
+        coordinator.meters = meters
+        MeterHub = Hub(api, coordinator, meters)
+        await coordinator.async_load()
+    except Exception:
+        await async_release_api(hass, entry)
+        raise
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = MeterHub
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
+    # the sensors are unknown until the portal answered, the first refresh
+    # must not hold up the setup with its retries
+    entry.async_create_background_task(
+        hass, coordinator.async_refresh(), f"{DOMAIN} first refresh"
+    )
+
+    # import the older history without blocking the setup, holes are retried
+    @callback
+    def start_backfill(now=None) -> None:
+        coordinator.backfill.async_start()
+
+    start_backfill()
+    entry.async_on_unload(
+        async_track_time_interval(
+            hass, start_backfill, timedelta(seconds=GAP_RETRY_INTERVAL)
+        )
+    )
+
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
@@ -38,6 +95,8 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # details
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        MeterHub = hass.data[DOMAIN].pop(entry.entry_id)
+        MeterHub.coordinator.backfill.async_cancel()
+        await async_release_api(hass, entry)
 
     return unload_ok
@@ -0,0 +1,88 @@
+"""Reduction of meter readings to hourly, daily and monthly values.
+
+All functions work on the time ordered columns of a ReadingResponse (epoch
+seconds and values) in a single pass and keep the first reading of every
+period, i.e. the meter reading at the start of the period.
+"""
+from __future__ import annotations
+
+import datetime
+from array import array
+from typing import Optional
+
+HOUR = 3600
+
+
+def hourly(
+    times: array,
+    values: array,
+    offset: float = 0,
+    after: Optional[int] = None,
+) -> tuple[array, array]:
+    """Reduce readings to one value per absolute hour.
+
+    offset is added to every time before it is bucketed. Hours up to and
+    including the epoch hour `after` are skipped, which lets a reduction
+    continue where the previous chunk of readings ended. Returns the start of
+    every hour in epoch seconds and its value.
+    """
+    starts = array("d")
+    hour_values = array("d")
+    last = after
+    for time, value in zip(times, values):
+        hour = int((time + offset) // HOUR)
+        if last is None or hour > last:
+            starts.append(hour * HOUR)
+            hour_values.append(value)
+            last = hour
+    return starts, hour_values
+
+
+def _period_start(time: datetime.datetime, period: str) -> datetime.datetime:
+    if period == "month":
+        time = time.replace(day=1)
+    return time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_period_start(start: datetime.datetime, period: str) -> datetime.datetime:
+    if period == "month":
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start + datetime.timedelta(days=1)
+
+
+def rollup(
+    times: array,
+    values: array,
+    tz: datetime.tzinfo,
+    period: str = "day",
+    offset: float = 0,
+    after: Optional[int] = None,
+) -> tuple[array, array]:
+    """Reduce readings to one value per local day or month.
+
+    The local calendar is only consulted when a reading crosses into the next
+    period, so the cost is one comparison per reading. offset and after work
+    like in hourly, after being an epoch hour. Returns the start of every
+    period in epoch seconds and its value.
+    """
+    if period not in ("day", "month"):
+        raise ValueError(f"Unknown period {period}")
+
+    starts = array("d")
+    period_values = array("d")
+    next_start = None if after is None else (after + 1) * HOUR
+    for time, value in zip(times, values):
+        time += offset
+        if next_start is not None and time < next_start:
+            continue
+        start = _period_start(datetime.datetime.fromtimestamp(time, tz), period)
+        if next_start is not None and start.timestamp() < next_start:
+            # the period started before `after`, it has been reduced already
+            next_start = _next_period_start(start, period).timestamp()
+            continue
+        starts.append(start.timestamp())
+        period_values.append(value)
+        next_start = _next_period_start(start, period).timestamp()
+    return starts, period_values
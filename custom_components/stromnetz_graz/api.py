@@ -1,13 +1,47 @@
 from __future__ import annotations
+import asyncio
+import base64
+import binascii
+import email.utils
+import json as jsonlib
+import random
 import ssl
-from .const import API_HOST
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from .const import (
+    API_HOST,
+    HOLE_MAX_REQUESTS,
+    HOLE_MERGE_GAP,
+    HOLE_SETTLE_AGE,
+    MAX_CONCURRENT_REQUESTS,
+    READINGS_WINDOW_MONTHS,
+    RESPONSE_CACHE_TTL,
+    RETRY_AFTER_MAX,
+    RETRY_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_STATUSES,
+    TOKEN_REFRESH_MARGIN,
+)
+from .coverage import RangeSet, coalesce
+from .limiter import AdaptiveLimiter
+from .metrics import SyncMetrics
+from .timestamps import decode_timestamp, decode_timestamps
 import aiohttp
 import datetime
-from typing import Optional
+import math
+from array import array
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable, Optional
 import pytz
 import logging
 from homeassistant import exceptions
 from homeassistant.core import dt_util
+from homeassistant.util.json import json_loads
+
+if TYPE_CHECKING:
+    from .cache import ReadingCache
+    from .transport import Transport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,15 +54,53 @@ class StromNetzGrazAPI:
     """
 
     def __init__(
-        self, email: str, password: str, session: Optional[aiohttp.ClientSession] = None
+        self,
+        email: str,
+        password: str,
+        session: Optional[aiohttp.ClientSession] = None,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        host: str = API_HOST,
+        json_loads: Callable[[bytes], Any] = json_loads,
+        transport: Optional[Transport] = None,
     ) -> None:
-        """Initialize the API wrapper."""
+        """Initialize the API wrapper.
+
+        json_loads decodes the response bodies, by default orjson as used by
+        Home Assistant. With a transport its session is used and the response
+        bodies are decompressed by it, see transport.py.
+        """
         self.email = email
         self.password = password
-
-        self.token = None
-        self.login_retries = 0
-
+        self.host = host
+        self.json_loads = json_loads
+
+        self.token: Optional[str] = None
+        # epoch seconds after which the token is no longer accepted, if known
+        self.token_expires: Optional[float] = None
+        self.token_issued: Optional[float] = None
+        # token lifetime learned from 401 responses, for tokens without exp claim
+        self.token_lifetime: Optional[float] = None
+        # called with token and expiry after every login
+        self.token_listener: Optional[Callable[[str, Optional[float]], None]] = None
+        # concurrent callers share this login
+        self._login_task: Optional[asyncio.Task] = None
+
+        self.metrics = SyncMetrics()
+
+        # optional persistent cache of Valid readings, see cache.py
+        self.cache: Optional[ReadingCache] = None
+
+        # limits the number of reading windows fetched in parallel
+        self.max_concurrency = max_concurrency
+        # adapts the requests in flight and their rate to the portal's responses
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        # getMeterReading requests in flight and recent responses, by request
+        self._inflight_requests: dict[tuple, asyncio.Task] = {}
+        self._recent_responses: dict[tuple, tuple[float, ReadingResponse]] = {}
+
+        self.transport = transport
+        if transport is not None:
+            session = transport.session
         if session is None:
             self.session = aiohttp.ClientSession()
         if session is not None:
@@ -46,7 +118,7 @@ class StromNetzGrazAPI:
     async def token_request(self) -> str:
         """Get the token from the API."""
         async with self.session.post(
-            f"{API_HOST}/login",
+            f"{self.host}/login",
             json={"email": self.email, "password": self.password},
         ) as response:
             if response.status != 200:
@@ -62,53 +134,169 @@ class StromNetzGrazAPI:
                 _LOGGER.error("Login - Unknown response from API: %s", mime)
                 raise AuthException
 
-            data = await response.json()
-            resp = LoginResponse(data)
+            data = self.json_loads(await self._read_body(response))
+            resp = LoginResponse.from_json(data)
             if not resp.success:
                 _LOGGER.error("Could not log in!")
                 raise AuthException
 
-            self.login_retries = 0
             return resp.token
 
-    async def loggedin_request(self, url: str, json: dict) -> dict:
-        """Make a request to the API. That take url and json as parameters."""
+    def token_valid(self) -> bool:
+        """Return True if there is a token that is not about to expire."""
         if not self.token:
-            self.token = await self.token_request()
-
-        async with self.session.post(
-            f"{API_HOST}{url}",
-            headers={"Authorization": f"Bearer {self.token}"},
-            json=json,
-        ) as response:
-            if response.status == 401:
-                _LOGGER.warning("Token invalid: Try to regenerate")
-                if self.login_retries > 0:
-                    _LOGGER.error("Could not log in! Too many retries")
-                    raise AuthException
-                # Retry once
-                self.token = await self.token_request()
-                self.login_retries += 1
-                return await self.loggedin_request(url, json)
-
-            if response.status != 200:
-                _LOGGER.error("%s - Statuscode is: %s", url, response.status)
-                raise UnknownResponseExeption
-
-            # check for mime type
-            mime = response.headers.get("Content-Type") or ""
-            if "application/json" not in mime:
-                _LOGGER.error("%s - Unknown response from API: %s", url, mime)
-                body = await response.text()
-                _LOGGER.error("%s - Body: %s", url, body)
-                raise UnknownResponseExeption
+            return False
+        if self.token_expires is None:
+            return True
+        return time.time() < self.token_expires - TOKEN_REFRESH_MARGIN
+
+    async def get_token(self) -> str:
+        """Return a valid token, logging in shortly before the old one expires."""
+        if self.token_valid():
+            return self.token
+        return await self.refresh_token(self.token)
+
+    async def refresh_token(self, stale_token: Optional[str]) -> str:
+        """Replace stale_token by a new one.
+
+        Only one login is in flight at a time, concurrent callers await it. If the
+        token was already replaced since stale_token was used, that one is returned.
+        """
+        if self.token != stale_token and self.token_valid():
+            return self.token
+        if self._login_task is None or self._login_task.done():
+            self._login_task = asyncio.create_task(self._login())
+        return await asyncio.shield(self._login_task)
+
+    async def _login(self) -> str:
+        token = await self.token_request()
+        now = time.time()
+        self.token = token
+        self.token_issued = now
+        self.token_expires = token_expiry(token)
+        if self.token_expires is None and self.token_lifetime is not None:
+            self.token_expires = now + self.token_lifetime
+        _LOGGER.debug("Logged in, token expires at %s", self.token_expires)
+        if self.token_listener is not None:
+            self.token_listener(token, self.token_expires)
+        return token
+
+    def _learn_token_lifetime(self, token: str) -> None:
+        """Remember how long a token lasted until it was rejected."""
+        if token != self.token or self.token_issued is None:
+            return
+        lifetime = time.time() - self.token_issued
+        if self.token_lifetime is None or lifetime < self.token_lifetime:
+            self.token_lifetime = lifetime
+            _LOGGER.info("Learned token lifetime of %s seconds", int(lifetime))
 
-            return await response.json()
+    async def loggedin_request(self, url: str, json: dict) -> dict:
+        """Make a request to the API. That take url and json as parameters.
+
+        Requests pass the adaptive limiter. 429 and 5xx responses and connection
+        errors are retried with jittered exponential backoff, or after the time
+        given by Retry-After.
+        """
+        token = await self.get_token()
+        auth_retried = False
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                status, body, retry_after = await self._post(url, json, token)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                if attempt >= RETRY_ATTEMPTS:
+                    raise
+                _LOGGER.warning("%s - Request failed: %s", url, repr(err))
+            else:
+                if status == 200:
+                    with self.metrics.time("json_decode"):
+                        return self.json_loads(body)
+
+                if status == 401:
+                    _LOGGER.warning("Token invalid: Try to regenerate")
+                    if auth_retried:
+                        _LOGGER.error("Could not log in! Too many retries")
+                        raise AuthException
+                    # Retry once
+                    auth_retried = True
+                    self._learn_token_lifetime(token)
+                    token = await self.refresh_token(token)
+                    continue
+
+                if status not in RETRY_STATUSES or attempt >= RETRY_ATTEMPTS:
+                    _LOGGER.error("%s - Statuscode is: %s", url, status)
+                    raise UnknownResponseExeption
+
+            delay = retry_delay(attempt, retry_after)
+            if retry_after is not None:
+                self.limiter.pause(delay)
+            attempt += 1
+            self.metrics.count("retries")
+            _LOGGER.info(
+                "%s - Retry %s of %s in %.1f seconds", url, attempt, RETRY_ATTEMPTS, delay
+            )
+            await asyncio.sleep(delay)
+
+    async def _post(
+        self, url: str, json: dict, token: str
+    ) -> tuple[int, Optional[bytes], Optional[float]]:
+        """Send one request through the limiter.
+
+        Returns the status, the body of a 200 response and the seconds of a
+        Retry-After header.
+        """
+        started = await self.limiter.acquire()
+        body = None
+        retry_after = None
+        try:
+            async with self.session.post(
+                f"{self.host}{url}",
+                headers={"Authorization": f"Bearer {token}"},
+                json=json,
+            ) as response:
+                status = response.status
+                self.metrics.count("requests")
+                self.metrics.count(f"http_{status}")
+                if status == 200:
+                    # check for mime type
+                    mime = response.headers.get("Content-Type") or ""
+                    if "application/json" not in mime:
+                        _LOGGER.error("%s - Unknown response from API: %s", url, mime)
+                        body = await self._read_body(response)
+                        _LOGGER.error(
+                            "%s - Body: %s", url, body.decode(errors="replace")
+                        )
+                        raise UnknownResponseExeption
+
+                    body = await self._read_body(response)
+                    self.metrics.add_time("request", time.monotonic() - started)
+                else:
+                    retry_after = parse_retry_after(
+                        response.headers.get("Retry-After")
+                    )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.limiter.release(started, failed=True)
+            raise
+        except BaseException:
+            self.limiter.release(started)
+            raise
+        self.limiter.release(started, status)
+        return status, body, retry_after
+
+    async def _read_body(self, response: aiohttp.ClientResponse) -> bytes:
+        """Read the body of response, decompressed by the transport if any."""
+        body = await response.read()
+        self.metrics.count("bytes_received", len(body))
+        if self.transport is not None:
+            encoding = response.headers.get("Content-Encoding")
+            body = self.transport.decode(body, encoding)
+        return body
 
     async def get_installations(self) -> InstallationsResponse:
         """Get the installations from the API."""
         data = await self.loggedin_request("/getInstallations", {})
-        return InstallationsResponse(data)
+        return InstallationsResponse.from_json(data)
 
     async def get_readings(
         self,
@@ -118,243 +306,672 @@ class StromNetzGrazAPI:
         quaterHour: bool = True,
     ) -> ReadingResponse:
         """Get the readings from the API."""
+        reading = None
+        async for response in self.iter_readings(
+            meter_point_id, start, end, quaterHour
+        ):
+            reading = response if reading is None else reading.merge(response)
+        return reading
+
+    async def iter_readings(
+        self,
+        meter_point_id: int,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        quaterHour: bool = True,
+    ) -> AsyncIterator[ReadingResponse]:
+        """Yield the readings window by window in time order.
+
+        At most max_concurrency windows are fetched ahead of the consumer, so the
+        memory used depends on the window size and not on the length of the range.
+        """
         tz_vienna = await dt_util.async_get_time_zone("Europe/Vienna")
         tz_vienna = tz_vienna or pytz.utc
 
         # Start time cannot be have minutes larger 45
-        start = start.astimezone(tz_vienna).replace(minute=0)
+        start = start.astimezone(tz_vienna).replace(
+            minute=0, second=0, microsecond=0
+        )
+        # round the end up to the next quarter hour, so requests for "now" made
+        # shortly after each other are identical and can be coalesced
         end = end.astimezone(tz_vienna)
+        if end.minute % 15 or end.second or end.microsecond:
+            end = end.replace(
+                minute=end.minute - end.minute % 15, second=0, microsecond=0
+            ) + datetime.timedelta(minutes=15)
+
+        windows = iter(backfill_windows(start, end))
+        pending: deque[asyncio.Task] = deque()
+
+        def schedule_next() -> None:
+            window = next(windows, None)
+            if window is not None:
+                pending.append(
+                    asyncio.create_task(
+                        self._get_window_readings(
+                            meter_point_id, *window, quaterHour, tz_vienna
+                        )
+                    )
+                )
 
-        duration = end - start
+        for _ in range(self.max_concurrency):
+            schedule_next()
 
-        # if larger than 5 months recursive call
-        if duration.days > 30 * 5:
-            # split the duration in half
-            half = duration // 2
-            # get the first half
-            first_half = await self.get_readings(
-                meter_point_id, start, start + half, quaterHour
-            )
-            # get the second half
-            second_half = await self.get_readings(
-                meter_point_id, start + half, end, quaterHour
+        try:
+            while pending:
+                reading = await pending.popleft()
+                schedule_next()
+                yield reading
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _get_window_readings(
+        self,
+        meter_point_id: int,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        quaterHour: bool,
+        tz: datetime.tzinfo,
+    ) -> ReadingResponse:
+        """Get the readings of a window, from the cache where possible."""
+        if self.cache is None:
+            return await self._get_readings_window(
+                meter_point_id, start, end, quaterHour, tz
             )
 
-            # combine the readings
-            return first_half.merge(second_half)
+        interval = "QuarterHourly" if quaterHour else "Daily"
+        reading, coverage = await self.cache.async_load(
+            meter_point_id, interval, start.timestamp(), end.timestamp(), tz
+        )
+        for window_start, window_end in uncovered_windows([(start, end)], coverage):
+            response = await self._get_readings_window(
+                meter_point_id, window_start, window_end, quaterHour, tz
+            )
+            # old readings still missing or NotAvailable will not show up anymore
+            readable = response.state_ranges(("Valid", "Estimated"))
+            settled = RangeSet(readable).missing(
+                window_start.timestamp(),
+                min(window_end.timestamp(), time.time() - HOLE_SETTLE_AGE),
+            )
+            await self.cache.async_store(meter_point_id, interval, response, settled)
+            reading = response if reading is None else reading.merge(response)
+
+        _LOGGER.debug(
+            "Readings of %s from %s to %s: %s rows",
+            meter_point_id,
+            start,
+            end,
+            len(reading),
+        )
+        return reading
 
+    async def _get_readings_window(
+        self,
+        meter_point_id: int,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        quaterHour: bool,
+        tz: datetime.tzinfo,
+    ) -> ReadingResponse:
+        """Get the readings of a single window from the API."""
         request_body = {
             "meterPointId": meter_point_id,
-            "fromDate": start.strftime("%Y-%m-%dT%H:%M:%S+02:00"),
-            "toDate": end.strftime("%Y-%m-%dT%H:%M:%S+02:00"),
+            "fromDate": start.isoformat(timespec="seconds"),
+            "toDate": end.isoformat(timespec="seconds"),
             "interval": "QuarterHourly" if quaterHour else "Daily",
             "unitOfConsumption": "KWH",
         }
 
+        # identical requests share one round trip and are answered from the
+        # recent responses for a few seconds
+        key = (
+            meter_point_id,
+            request_body["fromDate"],
+            request_body["toDate"],
+            request_body["interval"],
+        )
+        recent = self._recent_responses.get(key)
+        if recent is not None and recent[0] > time.monotonic():
+            _LOGGER.debug("Reusing recent response for %s", request_body)
+            return recent[1]
+
+        task = self._inflight_requests.get(key)
+        if task is None:
+            task = asyncio.create_task(self._request_readings(request_body, tz))
+            self._inflight_requests[key] = task
+            task.add_done_callback(lambda task: self._request_done(key, task))
+        else:
+            _LOGGER.debug("Joining in-flight request for %s", request_body)
+        return await asyncio.shield(task)
+
+    def _request_done(self, key: tuple, task: asyncio.Task) -> None:
+        self._inflight_requests.pop(key, None)
+        now = time.monotonic()
+        expired = [k for k, (ttl, _) in self._recent_responses.items() if ttl <= now]
+        for k in expired:
+            del self._recent_responses[k]
+        if not task.cancelled() and task.exception() is None:
+            self._recent_responses[key] = (now + RESPONSE_CACHE_TTL, task.result())
+
+    async def _request_readings(
+        self, request_body: dict, tz: datetime.tzinfo
+    ) -> ReadingResponse:
         _LOGGER.info("Requesting readings %s", request_body)
-
         data = await self.loggedin_request(
             "/getMeterReading",
             request_body,
         )
 
-        return ReadingResponse(data, tz_vienna)
+        with self.metrics.time("parse"):
+            reading = ReadingResponse(data, tz)
+        self.metrics.count("rows_parsed", len(reading))
+        return reading
 
 
-class LoginResponse:
-    """Response from the login request."""
+def retry_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Return the seconds to wait before retry number attempt + 1.
 
-    def __init__(self, data: dict) -> None:
-        self.data = data
+    Without Retry-After the delay grows exponentially, half of it is random so
+    clients failing together do not retry together.
+    """
+    if retry_after is not None:
+        return min(retry_after, RETRY_AFTER_MAX)
+    delay = min(RETRY_BASE_DELAY * 2**attempt, RETRY_MAX_DELAY)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the seconds of a Retry-After header, given in seconds or as date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max((date - dt_util.utcnow()).total_seconds(), 0)
+
+
+def token_expiry(token: str) -> Optional[float]:
+    """Return the exp claim of a JWT token, None if it is not a JWT."""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    payload = parts[1] + "=" * (-len(parts[1]) % 4)
+    try:
+        claims = jsonlib.loads(base64.urlsafe_b64decode(payload))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    exp = claims.get("exp") if isinstance(claims, dict) else None
+    return float(exp) if isinstance(exp, (int, float)) else None
+
+
+def backfill_windows(
+    start: datetime.datetime,
+    end: datetime.datetime,
+    months: int = READINGS_WINDOW_MONTHS,
+) -> list[tuple[datetime.datetime, datetime.datetime]]:
+    """Split [start, end) into windows aligned to calendar months.
+
+    Window boundaries are the first day of every `months`-th month (counted from
+    January) in the timezone of `start`, so the first and last window may be
+    shorter. Always returns at least one window.
+    """
+    windows = []
+    window_start = start
+
+    # first boundary after start
+    month_index = start.year * 12 + start.month - 1
+    month_index = month_index - month_index % months + months
+
+    while True:
+        boundary = start.replace(
+            year=month_index // 12,
+            month=month_index % 12 + 1,
+            day=1,
+            hour=0,
+            minute=0,
+            second=0,
+            microsecond=0,
+        )
+        if boundary >= end:
+            break
+        windows.append((window_start, boundary))
+        window_start = boundary
+        month_index += months
 
-    @property
-    def token(self) -> str:
-        return self.data["token"]
+    windows.append((window_start, end))
+    return windows
 
-    @property
-    def error(self) -> str:
-        return self.data["error"]
 
-    @property
-    def success(self) -> bool:
-        return self.data["success"]
+def uncovered_windows(
+    windows: list[tuple[datetime.datetime, datetime.datetime]], coverage: RangeSet
+) -> list[tuple[datetime.datetime, datetime.datetime]]:
+    """Return the parts of the windows that are not covered yet.
 
+    Every gap is requested on its own, from its start rounded down to the hour,
+    gaps closer than HOLE_MERGE_GAP are joined. A window with more than
+    HOLE_MAX_REQUESTS gaps is requested as one range from the first gap to the
+    last. Fully covered windows are dropped.
+    """
+    uncovered = []
+    for window_start, window_end in windows:
+        missing = coverage.missing(window_start.timestamp(), window_end.timestamp())
+        tz = window_start.tzinfo
+        gaps = coalesce(missing, HOLE_MERGE_GAP)
+        if len(gaps) > HOLE_MAX_REQUESTS:
+            gaps = [(gaps[0][0], gaps[-1][1])]
+        for gap_start, gap_end in gaps:
+            start = datetime.datetime.fromtimestamp(gap_start, tz).replace(
+                minute=0, second=0, microsecond=0
+            )
+            end = datetime.datetime.fromtimestamp(gap_end, tz)
+            uncovered.append((max(start, window_start), end))
+    return uncovered
 
-class InstallationsResponse:
-    def __init__(self, data: dict) -> None:
-        self.data = data
 
-    @property
-    def installations(self) -> list[Installation]:
-        return [Installation(installation) for installation in self.data]
+@dataclass(frozen=True, slots=True)
+class LoginResponse:
+    """Response from the login request."""
 
+    success: bool
+    token: str = ""
+    error: str = ""
 
-class Installation:
-    def __init__(self, data: dict) -> None:
-        self.data = data
+    @classmethod
+    def from_json(cls, data: dict) -> LoginResponse:
+        return cls(data["success"], data.get("token") or "", data.get("error") or "")
 
-    @property
-    def installationID(self) -> int:
-        return self.data["installationID"]
 
-    @property
-    def installationNumber(self) -> int:
-        return self.data["installationNumber"]
+@dataclass(frozen=True, slots=True)
+class InstallationsResponse:
+    """Response from the getInstallations request, indexed by installationID."""
 
-    @property
-    def customerID(self) -> int:
-        return self.data["customerID"]
+    installations: tuple[Installation, ...]
+    by_id: dict[int, Installation] = field(compare=False, repr=False)
 
-    @property
-    def customerNumber(self) -> int:
-        return self.data["customerNumber"]
+    @classmethod
+    def from_json(cls, data: list) -> InstallationsResponse:
+        installations = tuple(Installation.from_json(i) for i in data)
+        return cls(installations, {i.installationID: i for i in installations})
 
-    @property
-    def address(self) -> str:
-        return self.data["address"]
+    def installation(self, installationID: int) -> Optional[Installation]:
+        return self.by_id.get(installationID)
 
-    @property
-    def deliveryDirection(self) -> str:
-        return self.data["deliveryDirection"]
 
-    @property
-    def meterPoints(self) -> list[MeterPoint]:
-        return [MeterPoint(meterPoint) for meterPoint in self.data["meterPoints"]]
+@dataclass(frozen=True, slots=True)
+class Installation:
+    installationID: int
+    installationNumber: int
+    customerID: int
+    customerNumber: int
+    address: str
+    deliveryDirection: str
+    meterPoints: tuple[MeterPoint, ...]
+    meter_points_by_id: dict[int, MeterPoint] = field(compare=False, repr=False)
+
+    @classmethod
+    def from_json(cls, data: dict) -> Installation:
+        meterPoints = tuple(MeterPoint.from_json(m) for m in data["meterPoints"])
+        return cls(
+            data["installationID"],
+            data["installationNumber"],
+            data["customerID"],
+            data["customerNumber"],
+            data["address"],
+            data["deliveryDirection"],
+            meterPoints,
+            {m.meterPointID: m for m in meterPoints},
+        )
 
+    def meter_point(self, meterPointID: int) -> Optional[MeterPoint]:
+        return self.meter_points_by_id.get(meterPointID)
 
+
+@dataclass(frozen=True, slots=True)
 class MeterPoint:
-    def __init__(self, data: dict) -> None:
-        self.data = data
+    meterPointID: int
+    name: str
+    shortName: str
+    readingsAvailableSince: datetime.datetime
+    meterType: str
+
+    @classmethod
+    def from_json(cls, data: dict) -> MeterPoint:
+        return cls(
+            data["meterPointID"],
+            data["name"],
+            data["shortName"],
+            datetime.datetime.fromtimestamp(
+                decode_timestamp(data["readingsAvailableSince"]), datetime.timezone.utc
+            ),
+            data["meterType"],
+        )
 
-    @property
-    def meterPointID(self) -> int:
-        return self.data["meterPointID"]
 
-    @property
-    def name(self) -> str:
-        return self.data["name"]
+class CodeTable:
+    """Maps the strings of an enum-like API field to small integer codes."""
 
-    @property
-    def shortName(self) -> str:
-        return self.data["shortName"]
+    def __init__(self, names: Iterable[str]) -> None:
+        self.names: list[str] = []
+        self.codes: dict[str, int] = {}
+        for name in names:
+            self.code(name)
 
-    @property
-    def readingsAvailableSince(self) -> datetime.datetime:
-        return datetime.datetime.strptime(
-            self.data["readingsAvailableSince"], "%Y-%m-%dT%H:%M:%SZ"
-        )
+    def code(self, name: str) -> int:
+        """Return the code of name, registering unknown names."""
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self.codes[name] = code
+        return code
+
+    def name(self, code: int) -> str:
+        return self.names[code]
+
+    def intern(self, name: str) -> str:
+        """Return the one shared instance of name."""
+        return self.names[self.code(name)]
 
-    @property
-    def meterType(self) -> str:
-        return self.data["meterType"]
+
+READING_STATES = CodeTable(["Valid", "Estimated", "NotAvailable"])
+READING_TYPES = CodeTable(["MR"])
+UNITS = CodeTable(["KWH"])
+SCALES = CodeTable([""])
 
 
 class ReadingResponse:
+    """Readings of a meter point stored as parallel arrays.
+
+    The response is parsed once on construction. Every reading value is a row:
+    `times` holds the read time in UTC epoch seconds, `values` the value (NaN if
+    missing), `states`, `types`, `units` and `scales` the codes of readingState,
+    readingType, unit and scale. A row takes 24 bytes. Rows are sorted by time.
+    """
+
     def __init__(self, data: dict, tz: datetime.tzinfo) -> None:
-        self.data = data
         self.tz = tz
+        self.intervalType: str = data["intervalType"]
+
+        times = array("d")
+        values = array("d")
+        states = array("H")
+        types = array("H")
+        units = array("H")
+        scales = array("H")
+        readings = data["readings"]
+        read_times = decode_timestamps([reading["readTime"] for reading in readings])
+        for reading, read_time in zip(readings, read_times):
+            for readingValue in reading["readingValues"]:
+                value = readingValue["value"]
+                times.append(read_time)
+                values.append(math.nan if value is None else value)
+                states.append(READING_STATES.code(readingValue["readingState"]))
+                types.append(READING_TYPES.code(readingValue["readingType"]))
+                units.append(UNITS.code(readingValue["unit"]))
+                scales.append(SCALES.code(readingValue["scale"]))
+
+        self._set_columns(times, values, states, types, units, scales)
+
+    @classmethod
+    def from_columns(
+        cls,
+        intervalType: str,
+        tz: datetime.tzinfo,
+        times: array,
+        values: array,
+        states: array,
+        types: array,
+        units: array,
+        scales: array,
+    ) -> ReadingResponse:
+        """Create a response from already parsed columns."""
+        response = cls.__new__(cls)
+        response.tz = tz
+        response.intervalType = intervalType
+        response._set_columns(times, values, states, types, units, scales)
+        return response
+
+    def _set_columns(
+        self,
+        times: array,
+        values: array,
+        states: array,
+        types: array,
+        units: array,
+        scales: array,
+    ) -> None:
+        # the API returns sorted readings, so only sort if really needed
+        if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times = array("d", [times[i] for i in order])
+            values = array("d", [values[i] for i in order])
+            states = array("H", [states[i] for i in order])
+            types = array("H", [types[i] for i in order])
+            units = array("H", [units[i] for i in order])
+            scales = array("H", [scales[i] for i in order])
+
+        self.times = times
+        self.values = values
+        self.states = states
+        self.types = types
+        self.units = units
+        self.scales = scales
+        # False if a filter stopped at an unexpected reading state
+        self.complete = True
+        self._meter_reading_values: Optional[list[TimedReadingValue]] = None
+
+    def __len__(self) -> int:
+        return len(self.times)
 
     @property
-    def intervalType(self) -> str:
-        return self.data["intervalType"]
+    def meterReadingValues(self) -> list[TimedReadingValue]:
+        """Reading values with readingtype "MR" sorted by time."""
+        if self._meter_reading_values is None:
+            mr = READING_TYPES.code("MR")
+            self._meter_reading_values = [
+                self._timed_reading_value(i)
+                for i in range(len(self.times))
+                if self.types[i] == mr
+            ]
+        return self._meter_reading_values
+
+    def _timed_reading_value(self, i: int) -> TimedReadingValue:
+        value = self.values[i]
+        return TimedReadingValue(
+            READING_TYPES.name(self.types[i]),
+            None if math.isnan(value) else value,
+            UNITS.name(self.units[i]),
+            SCALES.name(self.scales[i]),
+            READING_STATES.name(self.states[i]),
+            self.times[i],
+        )
 
-    @property
-    def readings(self) -> list[Reading]:
-        return [Reading(reading) for reading in self.data["readings"]]
+    def take(self, indices: Iterable[int]) -> ReadingResponse:
+        """Return a response with the rows at the given indices."""
+        indices = list(indices)
+        return ReadingResponse.from_columns(
+            self.intervalType,
+            self.tz,
+            array("d", [self.times[i] for i in indices]),
+            array("d", [self.values[i] for i in indices]),
+            array("H", [self.states[i] for i in indices]),
+            array("H", [self.types[i] for i in indices]),
+            array("H", [self.units[i] for i in indices]),
+            array("H", [self.scales[i] for i in indices]),
+        )
 
-    @property
-    def meterReadingValues(self) -> list[TimedReadingValue]:
-        # extract reading values from readings with readingtype "MR" and add timestamp
-        values = [
-            TimedReadingValue(readingValue, reading.readTime, self.tz)
-            for reading in self.readings
-            for readingValue in reading.readingValues
-            if readingValue.readingType == "MR"
-        ]
-        # sort by time
-        return sorted(values, key=lambda x: x.time)
+    def filter(
+        self,
+        reading_type: Optional[str] = None,
+        keep: Optional[Iterable[str]] = None,
+        skip: Iterable[str] = (),
+    ) -> ReadingResponse:
+        """Filter rows by readingType and readingState.
+
+        Only rows of reading_type are considered (all if None). Rows with a state
+        in keep are returned (all if None), rows with a state in skip are dropped
+        and any other state ends the scan and marks the result as not complete.
+        """
+        type_code = None if reading_type is None else READING_TYPES.code(reading_type)
+        keep_codes = None if keep is None else {READING_STATES.code(s) for s in keep}
+        skip_codes = {READING_STATES.code(s) for s in skip}
+
+        indices = []
+        complete = True
+        for i, state in enumerate(self.states):
+            if type_code is not None and self.types[i] != type_code:
+                continue
+            if keep_codes is None or state in keep_codes:
+                indices.append(i)
+            elif state not in skip_codes:
+                _LOGGER.info("Reading State %s", READING_STATES.name(state))
+                complete = False
+                break
+        result = self.take(indices)
+        result.complete = complete
+        return result
+
+    def valid_ranges(self) -> list[tuple[float, float]]:
+        """Return the half open time ranges of runs of Valid readings."""
+        return self.state_ranges(("Valid",))
+
+    def state_ranges(self, states: Iterable[str]) -> list[tuple[float, float]]:
+        """Return the half open time ranges of runs of readings in states.
+
+        A read time belongs to a run if all values read at that time are in one
+        of the states. A run ends at the next read time, the last run of the
+        response one reading interval after its last read time.
+        """
+        codes = {READING_STATES.code(state) for state in states}
+        times = self.times
+        ranges = []
+        run_start = None
+        previous = None
+        i = 0
+        while i < len(times):
+            time = times[i]
+            in_states = True
+            while i < len(times) and times[i] == time:
+                in_states = in_states and self.states[i] in codes
+                i += 1
+            if in_states and run_start is None:
+                run_start = time
+            elif not in_states and run_start is not None:
+                ranges.append((run_start, time))
+                run_start = None
+            if i == len(times) and run_start is not None:
+                step = time - previous if previous is not None else 0
+                ranges.append((run_start, time + step))
+            previous = time
+        return ranges
 
     def merge(self, other: ReadingResponse) -> ReadingResponse:
-        """Merge two ReadingResponse objects."""
+        """Merge two ReadingResponse objects.
+
+        Rows of other replace rows of self with the same read time and type.
+        """
 
         if self.intervalType != other.intervalType:
             raise ValueError("Cannot merge different interval types")
 
-        # merge data
-        merged_data = {
-            "intervalType": self.intervalType,
-            "readings": self.data["readings"] + other.data["readings"],
-        }
+        base = self
+        if len(self) and len(other) and other.times[0] <= self.times[-1]:
+            replaced = set(zip(other.times, other.types))
+            base = self.take(
+                i
+                for i, key in enumerate(zip(self.times, self.types))
+                if key not in replaced
+            )
 
-        return ReadingResponse(
-            merged_data,
+        return ReadingResponse.from_columns(
+            self.intervalType,
             self.tz,
+            base.times + other.times,
+            base.values + other.values,
+            base.states + other.states,
+            base.types + other.types,
+            base.units + other.units,
+            base.scales + other.scales,
         )
 
 
 class Reading:
-    def __init__(self, data: dict) -> None:
-        self.data = data
+    """A reading of the API, its read time and the values read at that time."""
 
-    @property
-    def readTime(self) -> datetime.datetime:
-        if self.data["readTime"][-1] == "Z":
-            # parse 2023-11-12T23:00:00Z
-            return datetime.datetime.strptime(
-                self.data["readTime"], "%Y-%m-%dT%H:%M:%SZ"
-            ).astimezone(datetime.timezone.utc)
-
-        # parse 2023-11-03T00:00:00.000+01:00
-        return datetime.datetime.strptime(
-            self.data["readTime"], "%Y-%m-%dT%H:%M:%S.%f+%z"
-        ).astimezone(datetime.timezone.utc)
+    __slots__ = ("readTime", "readingValues")
 
-    @property
-    def readingValues(self) -> list[ReadingValue]:
-        return [
-            ReadingValue(readingValue) for readingValue in self.data["readingValues"]
+    def __init__(self, data: dict) -> None:
+        # 2023-11-12T23:00:00Z or 2023-11-03T00:00:00.000+01:00
+        self.readTime = datetime.datetime.fromtimestamp(
+            decode_timestamp(data["readTime"]), datetime.timezone.utc
+        )
+        self.readingValues = [
+            ReadingValue(readingValue) for readingValue in data["readingValues"]
         ]
 
 
 class ReadingValue:
+    """A value of a reading, with its enum-like fields interned."""
+
+    __slots__ = ("scale", "readingType", "value", "unit", "readingState")
+
     def __init__(self, data: dict) -> None:
-        self.data = data
+        self.scale = SCALES.intern(data["scale"])
+        self.readingType = READING_TYPES.intern(data["readingType"])
+        self.value: Optional[float] = data["value"]
+        self.unit = UNITS.intern(data["unit"])
+        self.readingState = READING_STATES.intern(data["readingState"])
 
     def __repr__(self) -> str:
         return f"ReadingValue({self.readingType}: {self.value} {self.unit})"
 
-    @property
-    def scale(self) -> str:
-        return self.data["scale"]
 
-    @property
-    def readingType(self) -> str:
-        return self.data["readingType"]
+# Statistics of a reading start one hour after its read time
+READ_TIME_OFFSET = datetime.timedelta(hours=1)
 
-    @property
-    def value(self) -> float:
-        return self.data["value"]
 
-    @property
-    def unit(self) -> str:
-        return self.data["unit"]
+class TimedReadingValue:
+    """A reading value together with the time it was read.
 
-    @property
-    def readingState(self) -> str:
-        return self.data["readingState"]
+    The time is kept as epoch seconds, time is created when it is accessed.
+    """
 
+    __slots__ = ("readingType", "value", "unit", "scale", "readingState", "timestamp")
 
-class TimedReadingValue(ReadingValue):
     def __init__(
-        self, reading: ReadingValue, time: datetime.datetime, tz: datetime.tzinfo
+        self,
+        readingType: str,
+        value: Optional[float],
+        unit: str,
+        scale: str,
+        readingState: str,
+        time: float | datetime.datetime,
     ) -> None:
-        self.data = reading.data
-        # self.time = time.replace(tzinfo=tz).astimezone(pytz.utc)
-        # self.time = time.astimezone(pytz.utc)
-        self.time = time + datetime.timedelta(hours=1)
+        self.readingType = READING_TYPES.intern(readingType)
+        self.value = value
+        self.unit = UNITS.intern(unit)
+        self.scale = SCALES.intern(scale)
+        self.readingState = READING_STATES.intern(readingState)
+        if isinstance(time, datetime.datetime):
+            time = time.timestamp()
+        # start of the statistic, see READ_TIME_OFFSET
+        self.timestamp = time + READ_TIME_OFFSET.total_seconds()
+
+    @property
+    def time(self) -> datetime.datetime:
+        return datetime.datetime.fromtimestamp(self.timestamp, datetime.timezone.utc)
 
     def __repr__(self) -> str:
-        return super().__repr__() + f" at {self.time}"
+        return (
+            f"ReadingValue({self.readingType}: {self.value} {self.unit}) at {self.time}"
+        )
 
 
 class AuthException(exceptions.HomeAssistantError):
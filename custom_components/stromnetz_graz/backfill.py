@@ -0,0 +1,119 @@
+"""Import of the history older than the recent range in a background task."""
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.util import dt as dt_util
+
+from .const import BACKFILL_PAUSE, DOMAIN
+
+if TYPE_CHECKING:
+    from .hub import Coordianator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Backfill:
+    """Imports the older history of all meters of a coordinator.
+
+    The regular updates only import the recent range, so the first refresh is
+    quick. The rest of the history is imported meter by meter and window by
+    window, pausing BACKFILL_PAUSE after every window so the import does not
+    crowd out other work. Progress is the share of the history imported, the
+    ETA is estimated from the progress made since the task started.
+    """
+
+    def __init__(self, coordinator: Coordianator) -> None:
+        self.coordinator = coordinator
+        self.task: Optional[asyncio.Task] = None
+        self.percent: Optional[float] = None
+        self.eta: Optional[datetime.datetime] = None
+        self._started = 0.0
+        self._covered_at_start = 0.0
+        # end of the history imported by the running task
+        self._until: Optional[float] = None
+        self._listeners: list[Callable[[], None]] = []
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @callback
+    def async_start(self) -> None:
+        """Start the import unless it is running already."""
+        if self.running:
+            return
+        self.task = self.coordinator.hass.async_create_background_task(
+            self._run(), f"{DOMAIN} backfill"
+        )
+
+    @callback
+    def async_restart(self) -> None:
+        self.async_cancel()
+        self.task = None
+        self.async_start()
+
+    @callback
+    def async_cancel(self) -> None:
+        if self.running:
+            self.task.cancel()
+
+    @callback
+    def async_add_listener(self, update: Callable[[], None]) -> CALLBACK_TYPE:
+        """Call update whenever the progress changed, return a remove callback."""
+        self._listeners.append(update)
+
+        @callback
+        def remove() -> None:
+            self._listeners.remove(update)
+
+        return remove
+
+    async def _run(self) -> None:
+        coordinator = self.coordinator
+        self._started = time.monotonic()
+        self._until = coordinator.history_end()
+        try:
+            await coordinator.async_load()
+            self._covered_at_start, _ = coordinator.history_coverage(self._until)
+            self._update()
+            for meter in coordinator.meters:
+                count = await coordinator.backfill_meter(meter, self._window_done)
+                _LOGGER.info(
+                    "Backfilled %s statistics for meter %s", count, meter.name
+                )
+        except asyncio.CancelledError:
+            _LOGGER.info("Backfill cancelled")
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.error("Backfill failed: %s", err)
+        finally:
+            self.eta = None
+            self._notify()
+
+    async def _window_done(self) -> None:
+        self._update()
+        await asyncio.sleep(BACKFILL_PAUSE)
+
+    @callback
+    def _update(self) -> None:
+        covered, total = self.coordinator.history_coverage(self._until)
+        self.percent = round(covered / total * 100, 1) if total else 100.0
+
+        self.eta = None
+        elapsed = time.monotonic() - self._started
+        progress = covered - self._covered_at_start
+        if progress > 0 and elapsed > 0:
+            remaining = (total - covered) / (progress / elapsed)
+            self.eta = dt_util.utcnow() + datetime.timedelta(seconds=remaining)
+        self._notify()
+
+    @callback
+    def _notify(self) -> None:
+        for update in list(self._listeners):
+            update()
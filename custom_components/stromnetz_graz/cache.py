@@ -0,0 +1,258 @@
+"""Persistent cache of meter readings that will not change anymore."""
+from __future__ import annotations
+
+import datetime
+import logging
+import math
+import sqlite3
+import threading
+from array import array
+from typing import Optional
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import STORAGE_DIR
+
+from .api import READING_STATES, READING_TYPES, SCALES, UNITS, ReadingResponse
+from .const import DOMAIN
+from .coverage import RangeSet
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    meter_point_id INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    time REAL NOT NULL,
+    reading_type TEXT NOT NULL,
+    value REAL,
+    reading_state TEXT NOT NULL,
+    unit TEXT,
+    scale TEXT,
+    PRIMARY KEY (meter_point_id, interval, time, reading_type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    meter_point_id INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    PRIMARY KEY (meter_point_id, interval, start_time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS settled (
+    meter_point_id INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    PRIMARY KEY (meter_point_id, interval, start_time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS interval_types (
+    meter_point_id INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    interval_type TEXT NOT NULL,
+    PRIMARY KEY (meter_point_id, interval)
+) WITHOUT ROWID;
+"""
+
+
+class ReadingCache:
+    """SQLite cache of readings per meter point and interval.
+
+    Only runs of Valid readings are stored, as they do not change anymore. The
+    covered time ranges are kept next to the readings, so callers know which
+    parts of a requested range still have to be fetched from the API. Old
+    ranges without Valid or Estimated readings are kept as settled, they are
+    not fetched again either.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: Optional[str] = None) -> None:
+        self.hass = hass
+        self.path = path or hass.config.path(STORAGE_DIR, f"{DOMAIN}.readings.db")
+        self._connection: Optional[sqlite3.Connection] = None
+        # the connection is used from different executor threads
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def _ranges(
+        self,
+        connection: sqlite3.Connection,
+        table: str,
+        meter_point_id: int,
+        interval: str,
+    ) -> RangeSet:
+        return RangeSet(
+            connection.execute(
+                f"SELECT start_time, end_time FROM {table}"
+                " WHERE meter_point_id = ? AND interval = ?",
+                (meter_point_id, interval),
+            )
+        )
+
+    def _save_ranges(
+        self,
+        connection: sqlite3.Connection,
+        table: str,
+        meter_point_id: int,
+        interval: str,
+        ranges: RangeSet,
+    ) -> None:
+        connection.execute(
+            f"DELETE FROM {table} WHERE meter_point_id = ? AND interval = ?",
+            (meter_point_id, interval),
+        )
+        connection.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?, ?)",
+            [
+                (meter_point_id, interval, range_start, range_end)
+                for range_start, range_end in ranges
+            ],
+        )
+
+    def _load(
+        self, meter_point_id: int, interval: str, start: float, end: float
+    ) -> tuple[Optional[str], RangeSet, list[tuple]]:
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT interval_type FROM interval_types"
+                " WHERE meter_point_id = ? AND interval = ?",
+                (meter_point_id, interval),
+            ).fetchone()
+            coverage = self._ranges(connection, "coverage", meter_point_id, interval)
+            settled = self._ranges(connection, "settled", meter_point_id, interval)
+
+            rows: list[tuple] = []
+            for range_start, range_end in coverage:
+                range_start = max(range_start, start)
+                range_end = min(range_end, end)
+                if range_start >= range_end:
+                    continue
+                rows.extend(
+                    connection.execute(
+                        "SELECT time, value, reading_state, reading_type, unit, scale"
+                        " FROM readings WHERE meter_point_id = ? AND interval = ?"
+                        " AND time >= ? AND time < ? ORDER BY time",
+                        (meter_point_id, interval, range_start, range_end),
+                    )
+                )
+        known = RangeSet([*coverage, *settled])
+        return (row[0] if row else None), known, rows
+
+    def _store(
+        self,
+        meter_point_id: int,
+        interval: str,
+        response: ReadingResponse,
+        settled: list[tuple[float, float]],
+    ) -> int:
+        ranges = response.valid_ranges()
+        if not ranges and not settled:
+            return 0
+
+        rows = []
+        for range_start, range_end in ranges:
+            rows.extend(
+                (
+                    meter_point_id,
+                    interval,
+                    response.times[i],
+                    READING_TYPES.name(response.types[i]),
+                    response.values[i],
+                    READING_STATES.name(response.states[i]),
+                    UNITS.name(response.units[i]),
+                    SCALES.name(response.scales[i]),
+                )
+                for i in range(len(response))
+                if range_start <= response.times[i] < range_end
+            )
+
+        with self._lock:
+            connection = self._connect()
+            coverage = self._ranges(connection, "coverage", meter_point_id, interval)
+            for range_start, range_end in ranges:
+                coverage.add(range_start, range_end)
+            known_settled = self._ranges(
+                connection, "settled", meter_point_id, interval
+            )
+            for range_start, range_end in settled:
+                known_settled.add(range_start, range_end)
+
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO interval_types VALUES (?, ?, ?)",
+                    (meter_point_id, interval, response.intervalType),
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._save_ranges(
+                    connection, "coverage", meter_point_id, interval, coverage
+                )
+                self._save_ranges(
+                    connection, "settled", meter_point_id, interval, known_settled
+                )
+        return len(rows)
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    async def async_load(
+        self,
+        meter_point_id: int,
+        interval: str,
+        start: float,
+        end: float,
+        tz: datetime.tzinfo,
+    ) -> tuple[Optional[ReadingResponse], RangeSet]:
+        """Load the cached readings in [start, end) and the known ranges.
+
+        Known ranges are covered by cached readings or settled.
+        """
+        interval_type, coverage, rows = await self.hass.async_add_executor_job(
+            self._load, meter_point_id, interval, start, end
+        )
+        if interval_type is None:
+            return None, coverage
+
+        reading = ReadingResponse.from_columns(
+            interval_type,
+            tz,
+            array("d", [row[0] for row in rows]),
+            array("d", [math.nan if row[1] is None else row[1] for row in rows]),
+            array("H", [READING_STATES.code(row[2]) for row in rows]),
+            array("H", [READING_TYPES.code(row[3]) for row in rows]),
+            array("H", [UNITS.code(row[4]) for row in rows]),
+            array("H", [SCALES.code(row[5]) for row in rows]),
+        )
+        _LOGGER.debug(
+            "Loaded %s cached rows for %s (%s)", len(reading), meter_point_id, interval
+        )
+        return reading, coverage
+
+    async def async_store(
+        self,
+        meter_point_id: int,
+        interval: str,
+        response: ReadingResponse,
+        settled: list[tuple[float, float]] = (),
+    ) -> None:
+        """Store the Valid readings of a response and the settled ranges.
+
+        settled are ranges without readings that are not expected to show up
+        anymore.
+        """
+        stored = await self.hass.async_add_executor_job(
+            self._store, meter_point_id, interval, response, list(settled)
+        )
+        _LOGGER.debug("Cached %s rows for %s (%s)", stored, meter_point_id, interval)
+
+    async def async_close(self) -> None:
+        """Close the database connection."""
+        await self.hass.async_add_executor_job(self._close)
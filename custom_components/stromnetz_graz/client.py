@@ -0,0 +1,129 @@
+"""API clients shared by all config entries of the same account."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import StromNetzGrazAPI
+from .cache import ReadingCache
+from .const import DOMAIN
+from .transport import Transport
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_CLIENTS = f"{DOMAIN}_clients"
+DATA_TOKEN_STORE = f"{DOMAIN}_token_store"
+DATA_TOKENS = f"{DOMAIN}_tokens"
+DATA_TOKENS_LOCK = f"{DOMAIN}_tokens_lock"
+
+TOKEN_STORAGE_VERSION = 1
+TOKEN_STORAGE_KEY = f"{DOMAIN}.tokens"
+
+
+class SharedClient:
+    """An API client and the config entries using it."""
+
+    def __init__(self, api: StromNetzGrazAPI) -> None:
+        self.api = api
+        self.entry_ids: set[str] = set()
+
+
+def _client_key(entry: ConfigEntry) -> tuple[str, str]:
+    return entry.data["email"].lower(), entry.data["password"]
+
+
+async def async_acquire_api(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> StromNetzGrazAPI:
+    """Return the API client of the entry's account, creating it if needed.
+
+    All entries of an account share the token, the request limit, the
+    connection pool and the reading cache of one client. The client has its
+    own HTTP session, which is closed with the last entry.
+    """
+    clients: dict[tuple[str, str], SharedClient] = hass.data.setdefault(
+        DATA_CLIENTS, {}
+    )
+    key = _client_key(entry)
+    client = clients.get(key)
+    if client is None:
+        api = StromNetzGrazAPI(
+            entry.data["email"], entry.data["password"], transport=Transport(hass)
+        )
+        api.cache = ReadingCache(hass)
+        client = clients[key] = SharedClient(api)
+        _LOGGER.info("Created API client for %s", entry.data["email"])
+        await _async_restore_token(hass, api)
+
+    client.entry_ids.add(entry.entry_id)
+    return client.api
+
+
+async def async_release_api(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Release the entry's reference, closing the client when it was the last."""
+    clients: dict[tuple[str, str], SharedClient] = hass.data.get(DATA_CLIENTS, {})
+    key = _client_key(entry)
+    client = clients.get(key)
+    if client is None:
+        return
+
+    client.entry_ids.discard(entry.entry_id)
+    if client.entry_ids:
+        return
+
+    del clients[key]
+    if client.api.cache is not None:
+        await client.api.cache.async_close()
+    if client.api.transport is not None:
+        await client.api.transport.async_close()
+    _LOGGER.info("Closed API client for %s", entry.data["email"])
+
+
+def _token_store(hass: HomeAssistant) -> Store:
+    store = hass.data.get(DATA_TOKEN_STORE)
+    if store is None:
+        store = hass.data[DATA_TOKEN_STORE] = Store(
+            hass, TOKEN_STORAGE_VERSION, TOKEN_STORAGE_KEY, private=True
+        )
+    return store
+
+
+async def _async_get_tokens(hass: HomeAssistant) -> dict[str, dict]:
+    """Return the stored tokens of all accounts, loading them on first use.
+
+    Every client updates this one dict, so a save never drops the tokens of
+    other accounts.
+    """
+    async with hass.data.setdefault(DATA_TOKENS_LOCK, asyncio.Lock()):
+        tokens = hass.data.get(DATA_TOKENS)
+        if tokens is None:
+            tokens = await _token_store(hass).async_load() or {}
+            hass.data[DATA_TOKENS] = tokens
+    return tokens
+
+
+async def _async_restore_token(hass: HomeAssistant, api: StromNetzGrazAPI) -> None:
+    """Reuse the token stored before the last restart and keep it up to date."""
+    store = _token_store(hass)
+    tokens = await _async_get_tokens(hass)
+    key = api.email.lower()
+
+    stored = tokens.get(key)
+    expires: Optional[float] = stored.get("expires") if stored else None
+    if stored and (expires is None or expires > time.time()):
+        api.token = stored["token"]
+        api.token_expires = expires
+        _LOGGER.debug("Restored token of %s", api.email)
+
+    @callback
+    def save_token(token: str, expires: Optional[float]) -> None:
+        tokens[key] = {"token": token, "expires": expires}
+        store.async_delay_save(lambda: tokens, 1)
+
+    api.token_listener = save_token
@@ -1,12 +1,12 @@
 from homeassistant import config_entries
 import voluptuous as vol
-from .const import DOMAIN
+from .const import CONF_QUARTER_HOUR_DAYS, DEFAULT_QUARTER_HOUR_DAYS, DOMAIN
 import logging
-from homeassistant.core import HomeAssistant
+from homeassistant.core import callback
 from typing import Any, Optional, Dict
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 
 from .api import StromNetzGrazAPI, AuthException
+from .transport import Transport
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,11 +16,9 @@ CREDENTIALS_DATA_SCHEMA = vol.Schema({
     }
 )
 
-async def validate_credentials(hass: HomeAssistant, data: dict) -> dict[str, Any]:
+async def validate_credentials(api: StromNetzGrazAPI, data: dict) -> dict[str, Any]:
     # Try to login
-    api = StromNetzGrazAPI(data["email"], data["password"])
-
-    await api.token_request()
+    await api.get_token()
 
     return {"email": data["email"], "password": data["password"]}
 
@@ -34,7 +32,33 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
     data: Optional[Dict[str, Any]]
-
+    # one session and login for all steps, closed when the flow is removed
+    _transport: Optional[Transport] = None
+    _api: Optional[StromNetzGrazAPI] = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry):
+        return OptionsFlowHandler(config_entry)
+
+    def _get_api(self, data: Dict[str, Any]) -> StromNetzGrazAPI:
+        """Return the API client of the flow for the credentials in data."""
+        if self._transport is None:
+            self._transport = Transport(self.hass)
+        api = self._api
+        credentials = (data["email"], data["password"])
+        if api is None or (api.email, api.password) != credentials:
+            api = self._api = StromNetzGrazAPI(
+                data["email"], data["password"], transport=self._transport
+            )
+        return api
+
+    @callback
+    def async_remove(self) -> None:
+        """Close the session of the flow."""
+        if self._transport is not None:
+            self.hass.async_create_task(self._transport.async_close())
+            self._transport = None
 
     async def async_step_user(self, user_input: Optional[Dict[str, Any]] = None):
         """Handle Credentials. Then select installation."""
@@ -42,7 +66,7 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         if user_input is not None:
             try:
-                data = await validate_credentials(self.hass, user_input)
+                data = await validate_credentials(self._get_api(user_input), user_input)
                 # return self.async_create_entry(title=data["email"], data=data)
             except AuthException:
                 errors["base"] = "auth"
@@ -72,21 +96,19 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
             if self.data:
                 self.data["installation"] = user_input["installation"]
-                api = StromNetzGrazAPI(self.data["email"], self.data["password"])
-                data = await api.get_installations()
+                data = await self._get_api(self.data).get_installations()
 
                 # Get Address
                 address = self.data["installation"]
-                for installation in data.installations:
-                    if installation.installationID == self.data["installation"]:
-                        address = installation.address
+                installation = data.installation(self.data["installation"])
+                if installation is not None:
+                    address = installation.address
 
                 return self.async_create_entry(title=address, data=self.data)
 
         installations = []
         if self.data:
-            api = StromNetzGrazAPI(self.data["email"], self.data["password"])
-            data = await api.get_installations()
+            data = await self._get_api(self.data).get_installations()
             installations = data.installations
 
         # Schema: Dropdown of installation address but value is the installation object
@@ -104,3 +126,26 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         return self.async_show_form(
             step_id="installation", data_schema=installations_schema, errors=errors, last_step=False
         )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """StromNetzGraz options: resolution of the imported history."""
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        self._config_entry = config_entry
+
+    async def async_step_init(self, user_input: Optional[Dict[str, Any]] = None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_QUARTER_HOUR_DAYS,
+                    default=self._config_entry.options.get(
+                        CONF_QUARTER_HOUR_DAYS, DEFAULT_QUARTER_HOUR_DAYS
+                    ),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=options_schema)
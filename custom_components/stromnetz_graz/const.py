@@ -2,3 +2,71 @@
 
 DOMAIN = "stromnetz_graz"
 API_HOST = "https://webportal.stromnetz-graz.at/api"
+
+# Backfill requests are split into calendar aligned windows of this many months
+READINGS_WINDOW_MONTHS = 3
+# Upper bound of the reading windows requested from the API at the same time
+MAX_CONCURRENT_REQUESTS = 4
+# Number of meters synchronised at the same time
+MAX_PARALLEL_METERS = 3
+# Seconds before its expiry at which a token is replaced
+TOKEN_REFRESH_MARGIN = 120
+# Seconds identical reading requests are answered from the last response
+RESPONSE_CACHE_TTL = 10
+
+# Option with the number of days fetched at quarter hour resolution, older
+# history is fetched and imported as daily readings
+CONF_QUARTER_HOUR_DAYS = "quarter_hour_days"
+DEFAULT_QUARTER_HOUR_DAYS = 90
+# Holes in the imported history closer than this many seconds are fetched together
+HOLE_MERGE_GAP = 86400
+# Windows with more holes than this are fetched with one request for all holes
+HOLE_MAX_REQUESTS = 3
+# Seconds after which readings that are still missing are not expected anymore,
+# older holes are given up once they were fetched
+HOLE_SETTLE_AGE = 62 * 86400
+# Seconds between fetches of holes before the newest imported reading
+GAP_RETRY_INTERVAL = 86400
+# Seconds after the import at which Estimated readings are fetched again, the
+# delay doubles with every check up to RECONCILE_MAX_DELAY
+RECONCILE_FIRST_DELAY = 6 * 3600
+RECONCILE_MAX_DELAY = 7 * 86400
+# Seconds after which Estimated readings are no longer expected to change
+RECONCILE_MAX_AGE = 62 * 86400
+# Seconds the cached installations are used before they are refreshed
+INSTALLATIONS_CACHE_TTL = 86400
+# Days of history imported by the regular updates, older history is imported
+# by a background task
+RECENT_SYNC_DAYS = 7
+# Seconds the background import pauses after every window of readings
+BACKFILL_PAUSE = 0.1
+# The request limiter halves the concurrent requests on errors and on requests
+# slower than LIMITER_SLOW_REQUEST seconds
+LIMITER_DECREASE_FACTOR = 0.5
+LIMITER_SLOW_REQUEST = 15
+# Seconds between request starts after the first 429, doubling with every
+# further 429 and shrinking by LIMITER_INTERVAL_STEP with every success
+LIMITER_MIN_INTERVAL = 0.5
+LIMITER_MAX_INTERVAL = 10
+LIMITER_INTERVAL_STEP = 0.05
+# Status codes of responses that are retried
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Number of retries of a request after a transient failure
+RETRY_ATTEMPTS = 5
+# Seconds of the first retry delay, doubling with every retry up to RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 60
+# Upper bound of the seconds waited for a Retry-After header
+RETRY_AFTER_MAX = 300
+# Connections kept open to the portal, idle connections are closed after
+# HTTP_KEEPALIVE_TIMEOUT seconds
+HTTP_POOL_SIZE = 8
+HTTP_KEEPALIVE_TIMEOUT = 60
+# Seconds the resolved address of the portal is reused
+HTTP_DNS_CACHE_TTL = 300
+# Seconds until a request, or only connecting, is given up
+HTTP_TIMEOUT = 120
+HTTP_CONNECT_TIMEOUT = 15
+# Statistics handed to the recorder at once, the next batch follows once the
+# recorder has written the previous one
+STATISTICS_BATCH_SIZE = 500
@@ -0,0 +1,178 @@
+"""Bookkeeping of time ranges, in epoch seconds, that are known to be complete."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Iterable, Iterator, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+DATA_COVERAGE_INDEX = f"{DOMAIN}_coverage_index"
+DATA_COVERAGE_LOCK = f"{DOMAIN}_coverage_lock"
+
+COVERAGE_STORAGE_VERSION = 1
+COVERAGE_STORAGE_KEY = f"{DOMAIN}.coverage"
+
+
+class RangeSet:
+    """A sorted set of disjoint half open [start, end) ranges."""
+
+    def __init__(self, ranges: Iterable[tuple[float, float]] = ()) -> None:
+        self.ranges: list[tuple[float, float]] = []
+        for start, end in ranges:
+            self.add(start, end)
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        return iter(self.ranges)
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def __repr__(self) -> str:
+        return f"RangeSet({self.ranges})"
+
+    def add(self, start: float, end: float) -> None:
+        """Add [start, end), merging it with overlapping or touching ranges."""
+        if end <= start:
+            return
+        merged = []
+        for range_start, range_end in self.ranges:
+            if range_end < start or range_start > end:
+                merged.append((range_start, range_end))
+            else:
+                start = min(start, range_start)
+                end = max(end, range_end)
+        merged.append((start, end))
+        merged.sort()
+        self.ranges = merged
+
+    def missing(self, start: float, end: float) -> list[tuple[float, float]]:
+        """Return the parts of [start, end) that are not covered."""
+        missing = []
+        for range_start, range_end in self.ranges:
+            if range_end <= start:
+                continue
+            if range_start >= end:
+                break
+            if range_start > start:
+                missing.append((start, range_start))
+            start = max(start, range_end)
+        if start < end:
+            missing.append((start, end))
+        return missing
+
+    def clear(self) -> None:
+        self.ranges = []
+
+
+def coalesce(
+    ranges: Iterable[tuple[float, float]], max_gap: float
+) -> list[tuple[float, float]]:
+    """Join sorted ranges that are at most max_gap apart."""
+    joined: list[tuple[float, float]] = []
+    for start, end in ranges:
+        if joined and start - joined[-1][1] <= max_gap:
+            joined[-1] = (joined[-1][0], max(end, joined[-1][1]))
+        else:
+            joined.append((start, end))
+    return joined
+
+
+class CoverageIndex:
+    """Read times imported as Valid statistics, per statistic id.
+
+    Shared by all config entries and persisted in HA storage, so holes left by
+    NotAvailable or Estimated readings are known after a restart. Holes that
+    are not expected to be filled anymore are settled and no longer missing.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.store = Store(hass, COVERAGE_STORAGE_VERSION, COVERAGE_STORAGE_KEY)
+        self.ranges: dict[str, RangeSet] = {}
+        # ranges given up, see HOLE_SETTLE_AGE
+        self.settled: dict[str, RangeSet] = {}
+        # last time the holes before the newest covered reading were fetched
+        self.gaps_checked: dict[str, float] = {}
+
+    async def async_load(self) -> None:
+        data = await self.store.async_load() or {}
+        for key, meter in data.items():
+            self.ranges[key] = RangeSet(meter["ranges"])
+            self.settled[key] = RangeSet(meter.get("settled", ()))
+            self.gaps_checked[key] = meter.get("gaps_checked", 0)
+
+    def get(self, key: str) -> RangeSet:
+        return self.ranges.setdefault(key, RangeSet())
+
+    @callback
+    def add(self, key: str, ranges: Iterable[tuple[float, float]]) -> None:
+        coverage = self.get(key)
+        for start, end in ranges:
+            coverage.add(start, end)
+        self._async_schedule_save()
+
+    @callback
+    def settle(self, key: str, start: float, end: float) -> None:
+        """Give up the holes in [start, end), they are no longer missing."""
+        if end <= start:
+            return
+        self.settled.setdefault(key, RangeSet()).add(start, end)
+        self._async_schedule_save()
+
+    def missing(self, key: str, start: float, end: float) -> list[tuple[float, float]]:
+        """Return the parts of [start, end) neither covered nor settled."""
+        return RangeSet(
+            [*self.get(key), *self.settled.get(key, ())]
+        ).missing(start, end)
+
+    @callback
+    def clear(self, key: str) -> None:
+        self.get(key).clear()
+        self.settled.pop(key, None)
+        self.gaps_checked.pop(key, None)
+        self._async_schedule_save()
+
+    def gaps_due(self, key: str, interval: float, now: Optional[float] = None) -> bool:
+        """Return True if the holes of key were not fetched within interval."""
+        now = time.time() if now is None else now
+        return now - self.gaps_checked.get(key, 0) >= interval
+
+    @callback
+    def mark_gaps_checked(self, key: str, now: Optional[float] = None) -> None:
+        self.gaps_checked[key] = time.time() if now is None else now
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        self.store.async_delay_save(self._data, 10)
+
+    async def async_save(self) -> None:
+        await self.store.async_save(self._data())
+
+    def _data(self) -> dict:
+        return {
+            key: {
+                "ranges": [list(r) for r in ranges],
+                "settled": [list(r) for r in self.settled.get(key, ())],
+                "gaps_checked": self.gaps_checked.get(key, 0),
+            }
+            for key, ranges in self.ranges.items()
+        }
+
+
+async def async_get_coverage_index(hass: HomeAssistant) -> CoverageIndex:
+    """Return the coverage index, loading it on first use.
+
+    Config entries are set up concurrently, the lock makes sure they all get
+    the same index.
+    """
+    async with hass.data.setdefault(DATA_COVERAGE_LOCK, asyncio.Lock()):
+        index = hass.data.get(DATA_COVERAGE_INDEX)
+        if index is None:
+            index = CoverageIndex(hass)
+            await index.async_load()
+            hass.data[DATA_COVERAGE_INDEX] = index
+    return index
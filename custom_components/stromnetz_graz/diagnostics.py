@@ -0,0 +1,37 @@
+"""Diagnostics support for Stromnetz Graz."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .hub import Hub
+
+TO_REDACT = {"email", "password"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    MeterHub: Hub = hass.data[DOMAIN][entry.entry_id]
+    coordinator = MeterHub.coordinator
+    next_poll = coordinator.scheduler.next_poll
+    transport = MeterHub.api.transport
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "meters": [
+            {"meter_id": meter.meter_id, "name": meter.name}
+            for meter in MeterHub.meters
+        ],
+        "next_poll": next_poll.isoformat() if next_poll else None,
+        "api": MeterHub.api.metrics.as_dict(),
+        "limiter": MeterHub.api.limiter.as_dict(),
+        "transport": transport.as_dict() if transport else None,
+        "coordinator": coordinator.metrics.as_dict(),
+        "writer": coordinator.writer.as_dict(),
+    }
@@ -1,6 +1,10 @@
 from __future__ import annotations
+import asyncio
 import datetime
-from typing import Any, Callable, Optional, Dict
+import time
+from collections import Counter
+from contextlib import aclosing
+from typing import Any, Awaitable, Callable, Optional, Dict
 
 import pytz
 from homeassistant.helpers import entity_registry
@@ -10,6 +14,7 @@ from homeassistant.components.recorder.models.statistics import (
 )
 from homeassistant.const import UnitOfEnergy
 from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
 import logging
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -18,49 +23,71 @@ from homeassistant.helpers.update_coordinator import (
 )
 
 from datetime import timedelta
+from . import aggregate
 from .api import (
+    READ_TIME_OFFSET,
+    READING_STATES,
     StromNetzGrazAPI,
     AuthException,
+    InstallationsResponse,
+    ReadingResponse,
     TimedReadingValue,
     UnknownResponseExeption,
 )
-from .const import DOMAIN
+from .const import (
+    DEFAULT_QUARTER_HOUR_DAYS,
+    DOMAIN,
+    GAP_RETRY_INTERVAL,
+    HOLE_MERGE_GAP,
+    HOLE_SETTLE_AGE,
+    MAX_PARALLEL_METERS,
+    RECENT_SYNC_DAYS,
+)
+from .backfill import Backfill
+from .coverage import CoverageIndex, async_get_coverage_index, coalesce
+from .reconcile import EstimatedRange, EstimatedTracker, async_get_estimated_tracker
+from .metrics import SyncMetrics
+from .scheduler import DEFAULT_INTERVAL, PollScheduler
+from .writer import StatisticsWriter
 
 from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.db_schema import Statistics
 from homeassistant.components.recorder.statistics import (
-    async_add_external_statistics,
-    get_last_statistics,
+    get_metadata_with_session,
     async_import_statistics,
     clear_statistics,
 )
+from homeassistant.components.recorder.util import session_scope
+from sqlalchemy import func, select
 
 _LOGGER = logging.getLogger(__name__)
 
 
 class Coordianator(DataUpdateCoordinator):
-    def __init__(self, hass: HomeAssistant, api: StromNetzGrazAPI):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: StromNetzGrazAPI,
+        quarter_hour_days: int = DEFAULT_QUARTER_HOUR_DAYS,
+    ):
         super().__init__(
             hass,
             _LOGGER,
             name="Stromnetz Graz",
-            update_interval=timedelta(minutes=30),
+            update_interval=DEFAULT_INTERVAL,
         )
         self.api = api
         self.meters: list[EnergyMeter] = []
-
-    def _only_last_reading_of_each_hour(
-        self, valid_readings: list[TimedReadingValue]
-    ) -> list[TimedReadingValue]:
-        """Return only the last reading of each hour."""
-        last_reading_of_each_hour = []
-        for reading in valid_readings:
-            if not last_reading_of_each_hour:
-                last_reading_of_each_hour.append(reading)
-            else:
-                last_reading = last_reading_of_each_hour[-1]
-                if reading.time.hour != last_reading.time.hour:
-                    last_reading_of_each_hour.append(reading)
-        return last_reading_of_each_hour
+        self.meter_semaphore = asyncio.Semaphore(MAX_PARALLEL_METERS)
+        # start of the last imported hour per statistic_id, saves recorder queries
+        self.last_imported: dict[str, float] = {}
+        self.scheduler = PollScheduler()
+        self.metrics = SyncMetrics()
+        self.quarter_hour_days = quarter_hour_days
+        self.coverage: Optional[CoverageIndex] = None
+        self.estimated: Optional[EstimatedTracker] = None
+        self.backfill = Backfill(self)
+        self.writer = StatisticsWriter(hass, self.metrics)
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
@@ -70,8 +97,11 @@ class Coordianator(DataUpdateCoordinator):
         """
 
         _LOGGER.info("Updating data from API")
+        new_data = False
         try:
-            await self.sync_data()
+            with self.metrics.time("sync"):
+                new_statistics = await self.sync_data()
+            new_data = any(new_statistics.values())
 
         except AuthException as err:
             # Raising ConfigEntryAuthFailed will cancel future updates
@@ -85,131 +115,445 @@ class Coordianator(DataUpdateCoordinator):
         except Exception as err:
             _LOGGER.error("Error communicating with API: %s", err)
             raise UpdateFailed(f"Error communicating with API: {err}")
+        finally:
+            self.update_interval = self.scheduler.next_interval(
+                dt_util.now(), new_data
+            )
+            _LOGGER.info("Next update at %s", self.scheduler.next_poll)
 
-    async def sync_data(self, full: bool = False):
-        """Sync data from API."""
-        for meter in self.meters:
-            _LOGGER.info("Updating meter %s", meter.name)
+    async def async_load(self) -> None:
+        """Load the coverage index and the Estimated ranges if not done yet."""
+        if self.coverage is None:
+            self.coverage = await async_get_coverage_index(self.hass)
+        if self.estimated is None:
+            self.estimated = await async_get_estimated_tracker(self.hass)
 
-            unique_id = f"{meter.meter_id}_reading"
-            entity_reg = entity_registry.async_get(self.hass)
-            sensor_entity = entity_reg.async_get_entity_id("sensor", DOMAIN, unique_id)
+    async def sync_data(self, full: bool = False) -> dict[int, int]:
+        """Sync data from API.
 
-            statistic_id = f"{DOMAIN}:{meter.meter_id}_reading"
-            _LOGGER.info("Getting last statistics for %s", statistic_id)
-            last_stats = await get_instance(self.hass).async_add_executor_job(
-                get_last_statistics, self.hass, 1, statistic_id, True, {"state"}
-            )
+        Meters are synced concurrently. A failing meter does not stop the others,
+        its error is raised once all meters are done. Returns the number of new
+        statistics per meter.
+        """
 
-            _LOGGER.info(
-                "Found %s last statistics for meter %s", len(last_stats), meter.name
-            )
+        await self.async_load()
+        if full:
+            self.last_imported.clear()
+        else:
+            await self._load_last_imported()
 
-            if full:
-                last_stats = None
+        entity_reg = entity_registry.async_get(self.hass)
 
-            reading = None
-            if not last_stats:
-                reading = await self.api.get_readings(
-                    meter.meter_id,
-                    meter.readingsAvailableSince + timedelta(days=1),
-                    datetime.datetime.now(),
-                )
-            else:
-                # only get readings after the last reading
-                start = last_stats[statistic_id][0].get("start")
-                last_stats_time = datetime.datetime.fromtimestamp(start or 0)
-                last_stats_time = last_stats_time.replace(minute=1)
-                _LOGGER.info(
-                    "Last statistics for meter %s is from %s",
-                    meter.name,
-                    last_stats_time,
-                )
-                reading = await self.api.get_readings(
-                    meter.meter_id, last_stats_time, datetime.datetime.now()
-                )
+        async def sync_meter(meter: EnergyMeter) -> int:
+            async with self.meter_semaphore:
+                return await self._sync_meter(meter, entity_reg, full)
 
-            _LOGGER.info(
-                "Found %s readings for meter %s",
-                len(reading.meterReadingValues),
-                meter.name,
-            )
+        results = await asyncio.gather(
+            *[sync_meter(meter) for meter in self.meters], return_exceptions=True
+        )
 
-            meterReadings = reading.meterReadingValues
-            # Find all readings from start up to last valid
-            validReadings: list[TimedReadingValue] = []
-            for r in meterReadings:
-                if r.readingState == "NotAvailable":
-                    continue
-                # TODO: Handle estimated readings better
-                if r.readingState == "Estimated":
-                    continue
-                if not r.readingState == "Valid":
-                    _LOGGER.info("Reading State %s", r.readingState)
-                    break
-                validReadings.append(r)
-
-            _LOGGER.info(
-                "Found %s valid readings for meter %s",
-                len(validReadings),
-                meter.name,
-            )
-            if len(validReadings) == 0:
+        now = dt_util.now()
+        errors = []
+        new_statistics = {}
+        for meter, result in zip(self.meters, results):
+            if isinstance(result, BaseException):
+                _LOGGER.error("Could not sync meter %s: %s", meter.name, result)
+                errors.append(result)
                 continue
+            new_statistics[meter.meter_id] = result
+            self.scheduler.record(meter.meter_id, now, result > 0)
+        if full:
+            # the older history is imported again in the background
+            self.backfill.async_restart()
+        if errors:
+            raise errors[0]
+        return new_statistics
+
+    async def _load_last_imported(self):
+        """Fetch the last statistics of all meters not known yet in one query."""
+        missing = [
+            self._statistic_id(meter)
+            for meter in self.meters
+            if self._statistic_id(meter) not in self.last_imported
+        ]
+        if not missing:
+            return
+
+        _LOGGER.info("Getting last statistics for %s", missing)
+        last_starts = await get_instance(self.hass).async_add_executor_job(
+            get_last_statistic_starts, self.hass, missing
+        )
+        _LOGGER.info("Found last statistics for %s", list(last_starts))
+        self.last_imported.update(last_starts)
+
+    def _statistic_id(self, meter: EnergyMeter) -> str:
+        return f"{DOMAIN}:{meter.meter_id}_reading"
+
+    async def _sync_meter(
+        self,
+        meter: EnergyMeter,
+        entity_reg: entity_registry.EntityRegistry,
+        full: bool,
+    ) -> int:
+        """Sync the recent data of one meter.
+
+        Only the holes in the coverage index of the last RECENT_SYNC_DAYS are
+        fetched, older history is left to the backfill. Holes before the newest
+        covered reading are retried every GAP_RETRY_INTERVAL. Ranges imported
+        from Estimated readings are fetched again when due and only changed
+        statistics are rewritten. As the sum of a statistic is the meter reading
+        itself, the statistics after a rewritten one stay valid. Returns the
+        number of imported statistics.
+        """
+        _LOGGER.info("Updating meter %s", meter.name)
+
+        unique_id = f"{meter.meter_id}_reading"
+        sensor_entity = entity_reg.async_get_entity_id("sensor", DOMAIN, unique_id)
+
+        statistic_id = self._statistic_id(meter)
+        last_stats_start = None if full else self.last_imported.get(statistic_id)
 
-            # _LOGGER.info(
-            #     "Setting reading for meter %s to %s",
-            #     meter.name,
-            #     validReadings[-1].value,
-            # )
-            # meter.setReading(validReadings[-1])
-
-            # Filter out all but the last reading of each hour
-            validReadings = self._only_last_reading_of_each_hour(validReadings)
-            _LOGGER.info(
-                "Found %s last readings for meter %s: %s",
-                len(validReadings),
-                meter.name,
-                validReadings[-1],
+        metadata = self._statistic_metadata(meter)
+
+        metadata_sensor = StatisticMetaData(
+            source="recorder",
+            name=f"{meter.name}",
+            statistic_id=sensor_entity or "sensor.meter_reading",
+            has_mean=False,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            has_sum=True,
+        )
+
+        since = self._history_start(meter)
+        coverage = self.coverage.get(statistic_id)
+        if full:
+            self.coverage.clear(statistic_id)
+            self.estimated.clear(statistic_id)
+        elif not coverage and last_stats_start is not None:
+            # history imported before the coverage index existed
+            self.coverage.add(statistic_id, [(since, last_stats_start)])
+
+        now = time.time()
+        holes = self.coverage.missing(
+            statistic_id, max(since, self._recent_start(now)), now
+        )
+        check_gaps = self.coverage.gaps_due(statistic_id, GAP_RETRY_INTERVAL, now)
+        if coverage and not check_gaps:
+            # only the readings after the newest covered one
+            newest = coverage.ranges[-1][1]
+            holes = [(start, end) for start, end in holes if start >= newest]
+        _LOGGER.info("Fetching %s holes of meter %s", len(holes), meter.name)
+
+        statistics_count = 0
+        for previous in self.estimated.due(statistic_id, now):
+            _LOGGER.info("Checking estimated readings of meter %s", meter.name)
+            count = await self._import_range(
+                meter,
+                metadata,
+                dt_util.utc_from_timestamp(previous.start),
+                dt_util.utc_from_timestamp(previous.end),
+                previous,
             )
+            self.metrics.count("statistics_reconciled", count)
+            statistics_count += count
+
+        for start, end in coalesce(holes, HOLE_MERGE_GAP):
+            statistics_count += await self._import_range(
+                meter,
+                metadata,
+                dt_util.utc_from_timestamp(start),
+                dt_util.utc_from_timestamp(end),
+            )
+        if check_gaps:
+            self.coverage.mark_gaps_checked(statistic_id, now)
+
+        _LOGGER.info(
+            "Added %s statistics for meter %s up to %s",
+            statistics_count,
+            meter.name,
+            self.last_imported.get(statistic_id),
+        )
+        return statistics_count
 
-            # Update history with valid readings
-            statistics = []
-            for r in validReadings:
-                timestamp = r.time.replace(
-                    tzinfo=pytz.utc, minute=0, second=0, microsecond=0
-                )
-                statistics.append(
-                    StatisticData(start=timestamp, state=r.value, sum=r.value)
-                )
+    async def backfill_meter(
+        self,
+        meter: EnergyMeter,
+        on_window: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> int:
+        """Import the holes of one meter older than the recent range.
 
-            _LOGGER.info(
-                "Adding %s statistics for meter %s", len(statistics), meter.name
+        on_window is awaited after every imported window. Returns the number of
+        imported statistics.
+        """
+        statistic_id = self._statistic_id(meter)
+        metadata = self._statistic_metadata(meter)
+        holes = self.coverage.missing(
+            statistic_id, self._history_start(meter), self.history_end()
+        )
+        _LOGGER.info("Backfilling %s holes of meter %s", len(holes), meter.name)
+
+        statistics_count = 0
+        for start, end in coalesce(holes, HOLE_MERGE_GAP):
+            statistics_count += await self._import_range(
+                meter,
+                metadata,
+                dt_util.utc_from_timestamp(start),
+                dt_util.utc_from_timestamp(end),
+                on_window=on_window,
             )
+        rate = self.writer.rows_per_second
+        _LOGGER.info(
+            "Backfilled %s statistics for meter %s, writing %s rows/s",
+            statistics_count,
+            meter.name,
+            round(rate) if rate is not None else None,
+        )
+        return statistics_count
 
-            metadata = StatisticMetaData(
-                source=DOMAIN,
-                name=f"{meter.name}",
-                statistic_id=statistic_id,
-                has_mean=False,
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                has_sum=True,
+    def history_coverage(self, until: Optional[float] = None) -> tuple[float, float]:
+        """Return the imported and the total seconds of history before until,
+        by default the start of the recent range, summed over all meters.
+        """
+        recent_start = self._recent_start(time.time()) if until is None else until
+        covered = total = 0.0
+        for meter in self.meters:
+            start = self._history_start(meter)
+            if start >= recent_start:
+                continue
+            missing = self.coverage.missing(
+                self._statistic_id(meter), start, recent_start
             )
+            total += recent_start - start
+            covered += recent_start - start - sum(e - s for s, e in missing)
+        return covered, total
+
+    def history_end(self) -> float:
+        """Return the end of the history left to the backfill."""
+        return self._recent_start(time.time())
+
+    def _history_start(self, meter: EnergyMeter) -> float:
+        return (meter.readingsAvailableSince + timedelta(days=1)).timestamp()
+
+    def _recent_start(self, now: float) -> float:
+        return now - RECENT_SYNC_DAYS * 86400
+
+    def _statistic_metadata(self, meter: EnergyMeter) -> StatisticMetaData:
+        return StatisticMetaData(
+            source=DOMAIN,
+            name=f"{meter.name}",
+            statistic_id=self._statistic_id(meter),
+            has_mean=False,
+            unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+            has_sum=True,
+        )
 
-            metadata_sensor = StatisticMetaData(
-                source="recorder",
-                name=f"{meter.name}",
-                statistic_id=sensor_entity or "sensor.meter_reading",
-                has_mean=False,
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                has_sum=True,
+    async def _import_range(
+        self,
+        meter: EnergyMeter,
+        metadata: StatisticMetaData,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        previous: Optional[EstimatedRange] = None,
+        on_window: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> int:
+        """Fetch the readings from start to end and import them as statistics.
+
+        The range is processed window by window: fetch, filter, reduce to hours
+        and import the statistics before the next window is processed. Once the
+        recorder committed the statistics of a window, its read times and runs
+        of Estimated readings are saved as checkpoint, so an interrupted import
+        resumes after the last committed window. previous is the Estimated
+        range checked again, statistics that did not change are not written
+        again and the range is replaced by the readings still Estimated in it.
+        on_window is awaited after every window. Returns the number of imported
+        statistics.
+        """
+        statistic_id = metadata["statistic_id"]
+        statistics_count = 0
+        now = time.time()
+        estimated: list[EstimatedRange] = []
+        last_hour: Optional[int] = None
+        last_imported = self.last_imported.get(statistic_id)
+        if previous is None and last_imported is not None:
+            if last_imported < end.timestamp():
+                # the range continues the import, its first hour may be stored
+                last_hour = int(last_imported // aggregate.HOUR)
+        complete = True
+        for tier_start, tier_end, quaterHour in self._backfill_tiers(start, end):
+            readings = self.api.iter_readings(
+                meter.meter_id, tier_start, tier_end, quaterHour
             )
+            complete = True
+            async with aclosing(readings):
+                async for reading in readings:
+                    window = self._window_statistics(reading, last_hour)
+                    last_hour = window.last_hour
+                    complete = window.complete
+
+                    statistics = window.statistics
+                    if previous is not None:
+                        statistics = [
+                            s
+                            for s in statistics
+                            if previous.values.get(s["start"].timestamp())
+                            != s["state"]
+                        ]
+
+                    if statistics:
+                        _LOGGER.debug(
+                            "Adding %s statistics for meter %s",
+                            len(statistics),
+                            meter.name,
+                        )
+
+                        # Add statistics to meter
+                        # async_import_statistics(self.hass, metadata_sensor, statistics)
+
+                        # Add additional statistics, the writer returns once
+                        # the recorder stored them, so the checkpoint never
+                        # gets ahead of the statistics actually stored
+                        with self.metrics.time("import"):
+                            await self.writer.async_write(metadata, statistics)
+                        statistics_count += len(statistics)
+                        self.last_imported[statistic_id] = max(
+                            statistics[-1]["start"].timestamp(),
+                            self.last_imported.get(statistic_id, 0),
+                        )
+
+                    self.coverage.add(statistic_id, window.covered)
+                    if previous is None:
+                        self.estimated.add(statistic_id, window.estimated, now)
+                    else:
+                        estimated.extend(window.estimated)
+                    await self._async_save_checkpoint()
+                    if on_window is not None:
+                        await on_window()
+
+                    if not complete:
+                        break
+            if not complete:
+                break
+
+        if complete:
+            # what is still missing of old readings will not show up anymore
+            self.coverage.settle(
+                statistic_id,
+                start.timestamp(),
+                min(end.timestamp(), now - HOLE_SETTLE_AGE),
+            )
+        if previous is not None:
+            self.estimated.add(statistic_id, estimated, now, previous)
+            await self._async_save_checkpoint()
+        return statistics_count
+
+    async def _async_save_checkpoint(self) -> None:
+        """Save the coverage index and the Estimated ranges right away."""
+        await self.coverage.async_save()
+        await self.estimated.async_save()
+
+    def _backfill_tiers(
+        self, start: datetime.datetime, end: datetime.datetime
+    ) -> list[tuple[datetime.datetime, datetime.datetime, bool]]:
+        """Split the range from start to end by resolution.
+
+        Readings older than quarter_hour_days, counted from the start of the
+        local day, are fetched as daily readings. Returns (start, end, quaterHour)
+        for every range to fetch in time order.
+        """
+        horizon = dt_util.start_of_local_day(
+            dt_util.now() - timedelta(days=self.quarter_hour_days)
+        )
+        if start >= horizon:
+            return [(start, end, True)]
+        if end <= horizon:
+            return [(start, end, False)]
+        return [(start, horizon, False), (horizon, end, True)]
+
+    def _window_statistics(
+        self, reading: ReadingResponse, last_hour: Optional[int]
+    ) -> WindowStatistics:
+        """Turn the readings of one window into hourly statistics.
+
+        Valid and Estimated readings are imported. Daily readings give one
+        statistic at the start of every local day. last_hour is the epoch hour
+        of the last statistic of the previous window.
+        """
+        with self.metrics.time("filter"):
+            meterReadings = reading.filter("MR")
 
-            # Add statistics to meter
-            # async_import_statistics(self.hass, metadata_sensor, statistics)
+            # Find all readings from start up to the first unexpected state
+            imported = meterReadings.filter(
+                keep=("Valid", "Estimated"), skip=("NotAvailable",)
+            )
+        _LOGGER.debug(
+            "Found %s readings, %s imported", len(meterReadings), len(imported)
+        )
+        self._count_dropped(meterReadings, imported)
+
+        period = aggregate.HOUR
+        offset = READ_TIME_OFFSET.total_seconds()
+        with self.metrics.time("hourly"):
+            if reading.intervalType == "Daily":
+                # Keep the first reading of each local day
+                period = 24 * aggregate.HOUR
+                starts, values = aggregate.rollup(
+                    imported.times,
+                    imported.values,
+                    reading.tz,
+                    "day",
+                    offset,
+                    last_hour,
+                )
+            else:
+                # Keep the first reading of each hour
+                starts, values = aggregate.hourly(
+                    imported.times, imported.values, offset, last_hour
+                )
+        if starts:
+            last_hour = int(starts[-1] // aggregate.HOUR)
+
+        # Update history with the readings
+        statistics = [
+            StatisticData(
+                start=datetime.datetime.fromtimestamp(start, pytz.utc),
+                state=value,
+                sum=value,
+            )
+            for start, value in zip(starts, values)
+        ]
+
+        covered = meterReadings.state_ranges(("Valid", "Estimated"))
+        estimated_ranges = meterReadings.state_ranges(("Estimated",))
+        if not imported.complete:
+            # nothing after the unexpected reading state is imported
+            stop = imported.times[-1] if len(imported) else float("-inf")
+            covered = _clip_ranges(covered, stop)
+            estimated_ranges = _clip_ranges(estimated_ranges, stop)
+
+        # the statistics computed from each run of Estimated readings
+        estimated = []
+        for range_start, range_end in estimated_ranges:
+            estimated_values = {
+                start: value
+                for start, value in zip(starts, values)
+                if start - offset < range_end and start - offset + period > range_start
+            }
+            estimated.append(EstimatedRange(range_start, range_end, estimated_values))
+
+        return WindowStatistics(
+            statistics, covered, estimated, last_hour, imported.complete
+        )
 
-            # Add additional statistics
-            async_add_external_statistics(self.hass, metadata, statistics)
+    def _count_dropped(
+        self, meterReadings: ReadingResponse, imported: ReadingResponse
+    ) -> None:
+        """Count the readings that did not make it into the statistics by state."""
+        counts = Counter(meterReadings.states)
+        counts.subtract(imported.states)
+        for code, count in counts.items():
+            if count:
+                state = READING_STATES.name(code)
+                self.metrics.count(f"rows_dropped_{state}", count)
 
     async def clear_data(self):
         # statistic_ids = [f"{DOMAIN}:{meter.meter_id}_reading" for meter in self.meters]
@@ -222,6 +566,69 @@ class Coordianator(DataUpdateCoordinator):
         pass
 
 
+class WindowStatistics:
+    """The statistics of one window of readings.
+
+    covered are the read time ranges imported, estimated the runs of Estimated
+    readings with the statistics computed from them. last_hour is the epoch
+    hour of the last statistic and complete is False if the readings stopped
+    at an unexpected reading state.
+    """
+
+    def __init__(
+        self,
+        statistics: list[StatisticData],
+        covered: list[tuple[float, float]],
+        estimated: list[EstimatedRange],
+        last_hour: Optional[int],
+        complete: bool,
+    ) -> None:
+        self.statistics = statistics
+        self.covered = covered
+        self.estimated = estimated
+        self.last_hour = last_hour
+        self.complete = complete
+
+
+def _clip_ranges(
+    ranges: list[tuple[float, float]], stop: float
+) -> list[tuple[float, float]]:
+    """Return the parts of ranges before stop."""
+    return [(start, min(end, stop)) for start, end in ranges if start < stop]
+
+
+def get_last_statistic_starts(
+    hass: HomeAssistant, statistic_ids: list[str]
+) -> dict[str, float]:
+    """Return the start of the newest statistic of each statistic_id.
+
+    Uses one query for all statistic ids. Statistic ids without statistics are
+    left out. Must be run in the recorder executor.
+    """
+    instance = get_instance(hass)
+    with session_scope(hass=hass, read_only=True) as session:
+        metadata = get_metadata_with_session(
+            instance, session, statistic_ids=set(statistic_ids)
+        )
+        if not metadata:
+            return {}
+
+        statistic_ids_by_metadata_id = {
+            metadata_id: statistic_id
+            for statistic_id, (metadata_id, _) in metadata.items()
+        }
+        rows = session.execute(
+            select(Statistics.metadata_id, func.max(Statistics.start_ts))
+            .where(Statistics.metadata_id.in_(statistic_ids_by_metadata_id))
+            .group_by(Statistics.metadata_id)
+        )
+        return {
+            statistic_ids_by_metadata_id[metadata_id]: start
+            for metadata_id, start in rows
+            if start is not None
+        }
+
+
 class EnergyMeter(CoordinatorEntity):
     def __init__(
         self,
@@ -280,18 +687,15 @@ class Hub:
         self.meters = meters
 
 
-async def meter_factory(
-    api: StromNetzGrazAPI, installationID: int, coordinator: Coordianator
-):
-    installations = await api.get_installations()
-    installations = installations.installations
-
+def meter_factory(
+    installations: InstallationsResponse,
+    installationID: int,
+    coordinator: Coordianator,
+) -> list[EnergyMeter]:
     # Find installation
-    installation = installations[0]
-    for i in installations:
-        if i.installationID == installationID:
-            installation = i
-            break
+    installation = installations.installation(installationID)
+    if installation is None:
+        installation = installations.installations[0]
 
     meterPoints = installation.meterPoints
     meters = []
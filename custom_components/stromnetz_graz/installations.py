@@ -0,0 +1,123 @@
+"""Installations of an account cached in HA storage, so setup needs no request."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import InstallationsResponse, StromNetzGrazAPI
+from .const import DOMAIN, INSTALLATIONS_CACHE_TTL
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_INSTALLATIONS_CACHE = f"{DOMAIN}_installations_cache"
+DATA_INSTALLATIONS_LOCK = f"{DOMAIN}_installations_lock"
+
+INSTALLATIONS_STORAGE_VERSION = 1
+INSTALLATIONS_STORAGE_KEY = f"{DOMAIN}.installations"
+
+
+class InstallationsCache:
+    """The getInstallations response of every account and when it was fetched."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self.store = Store(
+            hass, INSTALLATIONS_STORAGE_VERSION, INSTALLATIONS_STORAGE_KEY
+        )
+        self.accounts: dict[str, dict] = {}
+        # callbacks of the background refreshes in progress, by account
+        self.refreshing: dict[
+            str, list[Callable[[InstallationsResponse], None]]
+        ] = {}
+
+    async def async_load(self) -> None:
+        self.accounts = await self.store.async_load() or {}
+
+    async def async_get(
+        self,
+        api: StromNetzGrazAPI,
+        on_refresh: Optional[Callable[[InstallationsResponse], None]] = None,
+    ) -> InstallationsResponse:
+        """Return the installations of the api's account.
+
+        Cached installations are returned right away. If they are older than
+        INSTALLATIONS_CACHE_TTL they are refreshed in the background and
+        on_refresh is called with the new installations. Without a cache the
+        installations are fetched.
+        """
+        key = api.email.lower()
+        cached = self.accounts.get(key)
+        if cached is None:
+            return await self._async_refresh(api)
+
+        if time.time() - cached["fetched"] > INSTALLATIONS_CACHE_TTL:
+            self._schedule_refresh(api, on_refresh)
+        return InstallationsResponse.from_json(cached["installations"])
+
+    async def _async_refresh(self, api: StromNetzGrazAPI) -> InstallationsResponse:
+        data = await api.loggedin_request("/getInstallations", {})
+        installations = InstallationsResponse.from_json(data)
+        self.accounts[api.email.lower()] = {
+            "fetched": time.time(),
+            "installations": data,
+        }
+        self.store.async_delay_save(lambda: self.accounts, 1)
+        return installations
+
+    @callback
+    def _schedule_refresh(
+        self,
+        api: StromNetzGrazAPI,
+        on_refresh: Optional[Callable[[InstallationsResponse], None]],
+    ) -> None:
+        key = api.email.lower()
+        running = key in self.refreshing
+        callbacks = self.refreshing.setdefault(key, [])
+        if on_refresh is not None:
+            callbacks.append(on_refresh)
+        if running:
+            return
+
+        async def refresh() -> None:
+            try:
+                installations = await self._async_refresh(api)
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.warning("Could not refresh installations: %s", err)
+                return
+            finally:
+                self.refreshing.pop(key, None)
+            for notify in callbacks:
+                notify(installations)
+
+        self.hass.async_create_background_task(
+            refresh(), f"{DOMAIN} refresh installations"
+        )
+
+
+async def async_get_installations(
+    hass: HomeAssistant,
+    api: StromNetzGrazAPI,
+    on_refresh: Optional[Callable[[InstallationsResponse], None]] = None,
+) -> InstallationsResponse:
+    """Return the installations of the api's account, cached where possible."""
+    cache = await async_get_installations_cache(hass)
+    return await cache.async_get(api, on_refresh)
+
+
+async def async_get_installations_cache(hass: HomeAssistant) -> InstallationsCache:
+    """Return the installations cache, loading it on first use.
+
+    The lock makes concurrently set up config entries share one cache.
+    """
+    async with hass.data.setdefault(DATA_INSTALLATIONS_LOCK, asyncio.Lock()):
+        cache = hass.data.get(DATA_INSTALLATIONS_CACHE)
+        if cache is None:
+            cache = InstallationsCache(hass)
+            await cache.async_load()
+            hass.data[DATA_INSTALLATIONS_CACHE] = cache
+    return cache
@@ -0,0 +1,126 @@
+"""Client side limit of the requests sent to the portal."""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+from .const import (
+    LIMITER_DECREASE_FACTOR,
+    LIMITER_INTERVAL_STEP,
+    LIMITER_MAX_INTERVAL,
+    LIMITER_MIN_INTERVAL,
+    LIMITER_SLOW_REQUEST,
+)
+
+
+class AdaptiveLimiter:
+    """Limits the requests in flight and the rate at which they are started.
+
+    The limits follow AIMD: every fast successful response raises the number
+    of concurrent requests by 1/limit, i.e. by about one per round of requests,
+    up to max_limit. Slow responses, 5xx responses and connection errors halve
+    it, at most once per round, since the responses of requests started before
+    the last decrease tell nothing about the new limit. A 429 also spaces the
+    request starts, the pause doubles with every 429 and shrinks by
+    LIMITER_INTERVAL_STEP with every successful response.
+    """
+
+    def __init__(self, max_limit: int) -> None:
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        # seconds between the starts of two requests
+        self.interval = 0.0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def __repr__(self) -> str:
+        return (
+            f"AdaptiveLimiter(limit={self.limit:.2f}, in_flight={self.in_flight}, "
+            f"interval={self.interval:.2f})"
+        )
+
+    async def acquire(self) -> float:
+        """Wait for a free slot and the next start time.
+
+        Returns the start time to be passed to release.
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # the slot was handed over just before the cancellation
+                    self.release(time.monotonic())
+                else:
+                    self._waiters.remove(waiter)
+                raise
+
+        try:
+            now = time.monotonic()
+            start = max(now, self._next_start, self._paused_until)
+            self._next_start = start + self.interval
+            if start > now:
+                await asyncio.sleep(start - now)
+        except asyncio.CancelledError:
+            self.release(time.monotonic())
+            raise
+        return time.monotonic()
+
+    def release(
+        self, started: float, status: Optional[int] = None, failed: bool = False
+    ) -> None:
+        """Free the slot of a request and adapt the limits to its outcome.
+
+        status is the HTTP status of the response, failed is True if there was
+        no response. Without either the slot is freed without feedback.
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if status == 429:
+            self.interval = min(
+                max(self.interval * 2, LIMITER_MIN_INTERVAL), LIMITER_MAX_INTERVAL
+            )
+            self._decrease(started, now)
+        elif failed or (status is not None and status >= 500):
+            self._decrease(started, now)
+        elif status is not None and status < 400:
+            if now - started > LIMITER_SLOW_REQUEST:
+                self._decrease(started, now)
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+                self.interval = max(self.interval - LIMITER_INTERVAL_STEP, 0)
+        self._wake()
+
+    def pause(self, seconds: float) -> None:
+        """Start no request within the next seconds, e.g. after a Retry-After."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _decrease(self, started: float, now: float) -> None:
+        if started < self._decreased_at:
+            return
+        self.limit = max(self.limit * LIMITER_DECREASE_FACTOR, 1)
+        self._decreased_at = now
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def as_dict(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "interval_s": round(self.interval, 3),
+        }
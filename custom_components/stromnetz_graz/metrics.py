@@ -0,0 +1,63 @@
+"""Timing and volume counters of the sync pipeline."""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class PhaseTiming:
+    """Durations of the runs of one phase."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "mean_s": round(self.total / self.count, 4) if self.count else None,
+            "last_s": round(self.last, 4),
+            "max_s": round(self.max, 4),
+        }
+
+
+class SyncMetrics:
+    """Collects phase timings and counters, e.g. request latency or rows parsed."""
+
+    def __init__(self) -> None:
+        self.phases: dict[str, PhaseTiming] = {}
+        self.counters: dict[str, int] = {}
+
+    @contextmanager
+    def time(self, phase: str) -> Iterator[None]:
+        """Measure the duration of the enclosed block as a run of phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.phases.setdefault(phase, PhaseTiming()).add(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def phase(self, phase: str) -> PhaseTiming:
+        return self.phases.get(phase) or PhaseTiming()
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": {name: timing.as_dict() for name, timing in self.phases.items()},
+            "counters": dict(self.counters),
+        }
@@ -0,0 +1,189 @@
+"""Tracking of statistics imported from Estimated readings until they are Valid."""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Iterable, Optional
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    RECONCILE_FIRST_DELAY,
+    RECONCILE_MAX_AGE,
+    RECONCILE_MAX_DELAY,
+)
+
+DATA_ESTIMATED_TRACKER = f"{DOMAIN}_estimated_tracker"
+DATA_ESTIMATED_LOCK = f"{DOMAIN}_estimated_lock"
+
+ESTIMATED_STORAGE_VERSION = 1
+ESTIMATED_STORAGE_KEY = f"{DOMAIN}.estimated"
+
+
+class EstimatedRange:
+    """A run of Estimated read times and the statistics imported from it.
+
+    values maps the start of every hourly statistic, in epoch seconds, that was
+    computed from the run to its imported value.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        end: float,
+        values: dict[float, float],
+        first_seen: float = 0,
+        attempts: int = 0,
+        next_check: float = 0,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.values = values
+        self.first_seen = first_seen
+        self.attempts = attempts
+        self.next_check = next_check
+
+    def __repr__(self) -> str:
+        return (
+            f"EstimatedRange({self.start}, {self.end}, {len(self.values)} values, "
+            f"attempt {self.attempts})"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "start": self.start,
+            "end": self.end,
+            "values": [[start, value] for start, value in self.values.items()],
+            "first_seen": self.first_seen,
+            "attempts": self.attempts,
+            "next_check": self.next_check,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> EstimatedRange:
+        return cls(
+            data["start"],
+            data["end"],
+            {start: value for start, value in data["values"]},
+            data["first_seen"],
+            data["attempts"],
+            data["next_check"],
+        )
+
+
+def check_delay(attempts: int) -> float:
+    """Seconds until an Estimated range is fetched again after attempts checks."""
+    return min(RECONCILE_FIRST_DELAY * 2**attempts, RECONCILE_MAX_DELAY)
+
+
+class EstimatedTracker:
+    """Estimated ranges per statistic id, re-fetched on a decaying schedule.
+
+    A range is checked RECONCILE_FIRST_DELAY after it was imported, and the
+    delay doubles with every check that still finds Estimated readings, up to
+    RECONCILE_MAX_DELAY. Ranges older than RECONCILE_MAX_AGE are given up and
+    their estimated statistics are kept.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.store = Store(hass, ESTIMATED_STORAGE_VERSION, ESTIMATED_STORAGE_KEY)
+        self.ranges: dict[str, list[EstimatedRange]] = {}
+
+    async def async_load(self) -> None:
+        data = await self.store.async_load() or {}
+        for key, ranges in data.items():
+            self.ranges[key] = [EstimatedRange.from_dict(r) for r in ranges]
+
+    def get(self, key: str) -> list[EstimatedRange]:
+        return self.ranges.setdefault(key, [])
+
+    def due(self, key: str, now: Optional[float] = None) -> list[EstimatedRange]:
+        """Return the ranges of key that should be fetched again."""
+        now = time.time() if now is None else now
+        return [r for r in self.get(key) if r.next_check <= now]
+
+    @callback
+    def add(
+        self,
+        key: str,
+        ranges: Iterable[EstimatedRange],
+        now: Optional[float] = None,
+        previous: Optional[EstimatedRange] = None,
+    ) -> None:
+        """Track newly imported Estimated ranges.
+
+        previous is the range that was checked again and is replaced by the
+        ranges still Estimated in it. Touching ranges are merged, so the
+        Estimated readings at the end of the history stay a single range.
+        """
+        now = time.time() if now is None else now
+        tracked = self.get(key)
+        if previous is not None and previous in tracked:
+            tracked.remove(previous)
+
+        for estimated in ranges:
+            if any(
+                r.start <= estimated.start and estimated.end <= r.end for r in tracked
+            ):
+                # fetched again as part of a larger request, already tracked
+                continue
+            if previous is None:
+                estimated.first_seen = now
+                estimated.attempts = 0
+            else:
+                estimated.first_seen = previous.first_seen
+                estimated.attempts = previous.attempts + 1
+            if now - estimated.first_seen > RECONCILE_MAX_AGE:
+                continue
+            estimated.next_check = now + check_delay(estimated.attempts)
+            tracked.append(estimated)
+
+        tracked.sort(key=lambda r: r.start)
+        merged: list[EstimatedRange] = []
+        for estimated in tracked:
+            last = merged[-1] if merged else None
+            if last is not None and estimated.start <= last.end:
+                last.end = max(last.end, estimated.end)
+                last.values.update(estimated.values)
+                last.first_seen = min(last.first_seen, estimated.first_seen)
+                last.attempts = min(last.attempts, estimated.attempts)
+                last.next_check = min(last.next_check, estimated.next_check)
+            else:
+                merged.append(estimated)
+        self.ranges[key] = merged
+        self._async_schedule_save()
+
+    @callback
+    def clear(self, key: str) -> None:
+        self.ranges.pop(key, None)
+        self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        self.store.async_delay_save(self._data, 10)
+
+    async def async_save(self) -> None:
+        await self.store.async_save(self._data())
+
+    def _data(self) -> dict:
+        return {
+            key: [r.as_dict() for r in ranges]
+            for key, ranges in self.ranges.items()
+            if ranges
+        }
+
+
+async def async_get_estimated_tracker(hass: HomeAssistant) -> EstimatedTracker:
+    """Return the tracker of Estimated ranges, loading it on first use.
+
+    The lock makes concurrently set up config entries share one tracker.
+    """
+    async with hass.data.setdefault(DATA_ESTIMATED_LOCK, asyncio.Lock()):
+        tracker = hass.data.get(DATA_ESTIMATED_TRACKER)
+        if tracker is None:
+            tracker = EstimatedTracker(hass)
+            await tracker.async_load()
+            hass.data[DATA_ESTIMATED_TRACKER] = tracker
+    return tracker
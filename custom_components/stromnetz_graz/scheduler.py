@@ -0,0 +1,79 @@
+"""Polling schedule that follows when Stromnetz Graz publishes new readings."""
+from __future__ import annotations
+
+import datetime
+from collections import deque
+from datetime import timedelta
+from typing import Optional
+
+# Poll interval while new readings are expected
+DENSE_INTERVAL = timedelta(minutes=15)
+# Poll interval as long as no publication time has been learned
+DEFAULT_INTERVAL = timedelta(minutes=30)
+# Upper bound of the back off
+MAX_INTERVAL = timedelta(hours=6)
+# Readings are expected within this distance of a learned publication time
+ARRIVAL_WINDOW = timedelta(hours=1)
+# Number of publication times remembered per meter
+ARRIVAL_HISTORY = 14
+# Polls without new data counted for the back off, DENSE_INTERVAL doubled this
+# often is well beyond MAX_INTERVAL
+MAX_MISSES = 10
+
+
+class PollScheduler:
+    """Plans the next poll from the times new readings became available.
+
+    For every meter the time of day at which new Valid readings showed up is
+    remembered. Around these times the API is polled every DENSE_INTERVAL.
+    Otherwise the interval doubles with every poll that brings nothing new, up
+    to MAX_INTERVAL, but never beyond the start of the next expected arrival.
+    """
+
+    def __init__(self) -> None:
+        self.arrivals: dict[int, deque[int]] = {}
+        self.had_new_data: dict[int, bool] = {}
+        self.misses = 0
+        self.next_poll: Optional[datetime.datetime] = None
+
+    def record(self, meter_id: int, now: datetime.datetime, new_data: bool) -> None:
+        """Record the outcome of a poll for a meter.
+
+        Only a poll that brings new data after a poll without new data tells
+        when readings are published, the first poll just catches up.
+        """
+        if new_data and self.had_new_data.get(meter_id) is False:
+            minute = now.hour * 60 + now.minute
+            self.arrivals.setdefault(meter_id, deque(maxlen=ARRIVAL_HISTORY)).append(
+                minute
+            )
+        self.had_new_data[meter_id] = new_data
+
+    def _arrival_minutes(self) -> set[int]:
+        return {minute for minutes in self.arrivals.values() for minute in minutes}
+
+    def next_interval(
+        self, now: datetime.datetime, new_data: bool
+    ) -> datetime.timedelta:
+        """Return the time until the next poll and remember the planned poll."""
+        self.misses = 0 if new_data else min(self.misses + 1, MAX_MISSES)
+
+        arrivals = self._arrival_minutes()
+        if not arrivals:
+            interval = DEFAULT_INTERVAL
+        else:
+            interval = min(DENSE_INTERVAL * 2**self.misses, MAX_INTERVAL)
+
+            midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            for minute in arrivals:
+                for day in (-1, 0, 1):
+                    expected = midnight + timedelta(days=day, minutes=minute)
+                    window_start = expected - ARRIVAL_WINDOW
+                    if window_start <= now <= expected + ARRIVAL_WINDOW:
+                        interval = DENSE_INTERVAL
+                    elif now < window_start:
+                        interval = min(interval, window_start - now)
+            interval = max(interval, DENSE_INTERVAL)
+
+        self.next_poll = now + interval
+        return interval
@@ -10,13 +10,21 @@ from homeassistant.components.sensor import (
     SensorEntity,
     SensorStateClass,
 )
-from homeassistant.const import MATCH_ALL, UnitOfEnergy
+from homeassistant.const import (
+    MATCH_ALL,
+    EntityCategory,
+    PERCENTAGE,
+    UnitOfEnergy,
+    UnitOfInformation,
+    UnitOfTime,
+)
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.core import callback
 from homeassistant.helpers import config_validation as cv, entity_platform, service
 
 from .const import DOMAIN
 import logging
+from typing import Any, Callable
 from .hub import Hub
 
 
@@ -38,6 +46,10 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
         sensor = MeterReadingSensor(meter)
         sensors.append(sensor)
 
+    if MeterHub.meters:
+        sensors.extend(sync_metric_sensors(MeterHub))
+        sensors.append(BackfillProgressSensor(MeterHub.meters[0]))
+
     # add sensors
     async_add_entities(sensors)
 
@@ -116,7 +128,150 @@ class MeterReadingSensor(CoordinatorEntity, SensorEntity):
     #     self._state = self.coordinator.data[self._meter.meter_id]["reading"]
     #     self.async_write_ha_state()
 
+    @property
+    def extra_state_attributes(self):
+        """Return the time of the next planned update."""
+        next_poll = self._meter.coordinator.scheduler.next_poll
+        return {"next_poll": next_poll.isoformat() if next_poll else None}
+
     @property
     def native_value(self):
         """Return the value of the sensor."""
         return self._meter.reading
+
+
+def sync_metric_sensors(MeterHub: Hub) -> list[SyncMetricSensor]:
+    """Create the diagnostic sensors of the sync pipeline."""
+    api = MeterHub.api.metrics
+    coordinator = MeterHub.coordinator.metrics
+    writer = MeterHub.coordinator.writer
+    meter = MeterHub.meters[0]
+    return [
+        SyncMetricSensor(
+            meter,
+            "sync_duration",
+            "Sync Duration",
+            UnitOfTime.SECONDS,
+            lambda: round(coordinator.phase("sync").last, 3),
+        ),
+        SyncMetricSensor(
+            meter,
+            "request_latency",
+            "Request Latency",
+            UnitOfTime.MILLISECONDS,
+            lambda: round(api.phase("request").last * 1000),
+        ),
+        SyncMetricSensor(
+            meter,
+            "bytes_received",
+            "Bytes Received",
+            UnitOfInformation.BYTES,
+            lambda: api.counters.get("bytes_received", 0),
+        ),
+        SyncMetricSensor(
+            meter,
+            "rows_parsed",
+            "Rows Parsed",
+            None,
+            lambda: api.counters.get("rows_parsed", 0),
+        ),
+        SyncMetricSensor(
+            meter,
+            "statistics_written",
+            "Statistics Written",
+            None,
+            lambda: coordinator.counters.get("statistics_written", 0),
+        ),
+        SyncMetricSensor(
+            meter,
+            "statistics_write_rate",
+            "Statistics Write Rate",
+            "rows/s",
+            lambda: round(writer.last_rate) if writer.last_rate else None,
+        ),
+    ]
+
+
+class SyncMetricSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor exposing one counter of the sync pipeline."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        meter: EnergyMeter,
+        key: str,
+        name: str,
+        unit: str | None,
+        value: Callable[[], Any],
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(meter.coordinator)
+        self._meter = meter
+        self._value = value
+        self._attr_name = name
+        self._attr_unique_id = f"{meter.meter_id}_{key}"
+        self._attr_native_unit_of_measurement = unit
+        if key in ("bytes_received", "rows_parsed", "statistics_written"):
+            self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        else:
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+
+    @property
+    def device_info(self):
+        """Return information to link this entity with the correct device."""
+        return {
+            "identifiers": {(DOMAIN, self._meter.meter_id)},
+            "name": self._meter.name,
+            "manufacturer": "Stromnetz Graz",
+        }
+
+    @property
+    def native_value(self):
+        """Return the value of the counter."""
+        return self._value()
+
+
+class BackfillProgressSensor(SensorEntity):
+    """Diagnostic sensor with the share of the history imported so far."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_name = "History Imported"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_should_poll = False
+
+    def __init__(self, meter: EnergyMeter) -> None:
+        """Initialize the sensor."""
+        self._meter = meter
+        self._backfill = meter.coordinator.backfill
+        self._attr_unique_id = f"{meter.meter_id}_history_imported"
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            self._backfill.async_add_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def device_info(self):
+        """Return information to link this entity with the correct device."""
+        return {
+            "identifiers": {(DOMAIN, self._meter.meter_id)},
+            "name": self._meter.name,
+            "manufacturer": "Stromnetz Graz",
+        }
+
+    @property
+    def native_value(self):
+        """Return the percentage of the history imported."""
+        return self._backfill.percent
+
+    @property
+    def extra_state_attributes(self):
+        """Return whether the import is running and when it should be done."""
+        eta = self._backfill.eta
+        return {
+            "running": self._backfill.running,
+            "eta": eta.isoformat() if eta else None,
+        }
@@ -0,0 +1,76 @@
+"""Decoding of the timestamps returned by the Stromnetz Graz API."""
+from __future__ import annotations
+
+import datetime
+from array import array
+from functools import lru_cache
+from typing import Iterable
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _day_seconds(date: str) -> int:
+    """Return the epoch seconds of midnight UTC of a YYYY-MM-DD date."""
+    day = datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10]))
+    return (day.toordinal() - _EPOCH_ORDINAL) * 86400
+
+
+def _decode_fallback(value: str) -> float:
+    """Decode any ISO 8601 timestamp, naive timestamps are treated as UTC."""
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def decode_timestamp(value: str) -> float:
+    """Decode a timestamp of the API to UTC epoch seconds.
+
+    The wire formats 2023-11-12T23:00:00Z and 2023-11-03T00:00:00.000+01:00 are
+    decoded by slicing the fixed positions, everything else falls back to
+    datetime.fromisoformat.
+    """
+    if len(value) < 20 or value[10] != "T" or value[13] != ":" or value[16] != ":":
+        return _decode_fallback(value)
+
+    try:
+        seconds = (
+            _day_seconds(value[:10])
+            + int(value[11:13]) * 3600
+            + int(value[14:16]) * 60
+            + int(value[17:19])
+        )
+
+        suffix = value[19:]
+        if suffix == "Z":
+            return seconds
+
+        if suffix[0] == ".":
+            # fraction of a second, followed by the offset
+            end = 1
+            while end < len(suffix) and suffix[end].isdigit():
+                end += 1
+            fraction = float(suffix[:end])
+            suffix = suffix[end:]
+        else:
+            fraction = 0.0
+
+        if suffix == "Z":
+            return seconds + fraction
+
+        sign = suffix[:1]
+        offset = suffix[1:].replace(":", "")
+        if sign not in ("+", "-") or len(offset) != 4:
+            return _decode_fallback(value)
+        offset_seconds = int(offset[:2]) * 3600 + int(offset[2:]) * 60
+        if sign == "-":
+            offset_seconds = -offset_seconds
+        return seconds + fraction - offset_seconds
+    except ValueError:
+        return _decode_fallback(value)
+
+
+def decode_timestamps(values: Iterable[str]) -> array:
+    """Decode a batch of API timestamps to an array of UTC epoch seconds."""
+    return array("d", map(decode_timestamp, values))
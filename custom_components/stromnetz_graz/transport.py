@@ -0,0 +1,161 @@
+"""HTTP session of the integration, tuned for the portal's large reading payloads."""
+from __future__ import annotations
+
+import logging
+import zlib
+from types import SimpleNamespace
+from typing import Optional
+
+import aiohttp
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant
+from homeassistant.helpers.aiohttp_client import ENABLE_CLEANUP_CLOSED, SERVER_SOFTWARE
+from homeassistant.util import ssl as ssl_util
+
+from .const import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUT,
+)
+from .metrics import SyncMetrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_LOGGER = logging.getLogger(__name__)
+
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+class Transport:
+    """A dedicated session with its own keep-alive connection pool.
+
+    Responses are not decompressed by aiohttp but by decode, so the bytes on
+    the wire and the decompressed bytes can both be counted. The counters of
+    new and reused connections come from aiohttp's request tracing.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.metrics = SyncMetrics()
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(self._on_connection_create)
+        trace.on_connection_reuseconn.append(self._on_connection_reuse)
+        trace.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(self._on_dns_cache_miss)
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            enable_cleanup_closed=ENABLE_CLEANUP_CLOSED,
+            ssl=ssl_util.get_default_context(),
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers={
+                "User-Agent": SERVER_SOFTWARE,
+                "Accept-Encoding": ACCEPT_ENCODING,
+            },
+            timeout=aiohttp.ClientTimeout(
+                total=HTTP_TIMEOUT, sock_connect=HTTP_CONNECT_TIMEOUT
+            ),
+            auto_decompress=False,
+            trace_configs=[trace],
+        )
+        # close the session with Home Assistant if no one did before
+        self._remove_close_listener: Optional[CALLBACK_TYPE] = (
+            hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_CLOSE, self._async_close_event
+            )
+        )
+
+    async def _async_close_event(self, event: Event) -> None:
+        self._remove_close_listener = None
+        await self.async_close()
+
+    async def async_close(self) -> None:
+        """Close the session and its connections."""
+        if self._remove_close_listener is not None:
+            self._remove_close_listener()
+            self._remove_close_listener = None
+        if not self.session.closed:
+            await self.session.close()
+            _LOGGER.debug("Closed HTTP session, %s", self.metrics.counters)
+
+    def decode(self, body: bytes, encoding: Optional[str]) -> bytes:
+        """Decompress a response body sent with Content-Encoding encoding."""
+        encoding = (encoding or "").strip().lower()
+        if encoding in ("", "identity"):
+            self.metrics.count("bytes_uncompressed", len(body))
+            return body
+
+        try:
+            if encoding == "gzip":
+                data = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            elif encoding == "deflate":
+                try:
+                    data = zlib.decompress(body)
+                except zlib.error:
+                    # some servers send raw deflate without the zlib header
+                    data = zlib.decompress(body, -zlib.MAX_WBITS)
+            elif encoding == "br" and brotli is not None:
+                data = brotli.decompress(body)
+            else:
+                raise aiohttp.ClientPayloadError(
+                    f"Unsupported Content-Encoding {encoding}"
+                )
+        except (zlib.error, ValueError) as err:
+            # a truncated or corrupt body, retried like a dropped connection
+            raise aiohttp.ClientPayloadError(f"Could not decode {encoding}: {err}")
+
+        self.metrics.count("bytes_compressed", len(body))
+        self.metrics.count("bytes_decompressed", len(data))
+        return data
+
+    async def _on_connection_create(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceConnectionCreateEndParams,
+    ) -> None:
+        self.metrics.count("connections_new")
+
+    async def _on_connection_reuse(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceConnectionReuseconnParams,
+    ) -> None:
+        self.metrics.count("connections_reused")
+
+    async def _on_dns_cache_hit(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceDnsCacheHitParams,
+    ) -> None:
+        self.metrics.count("dns_cache_hits")
+
+    async def _on_dns_cache_miss(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceDnsCacheMissParams,
+    ) -> None:
+        self.metrics.count("dns_cache_misses")
+
+    def as_dict(self) -> dict:
+        counters = self.metrics.counters
+        compressed = counters.get("bytes_compressed", 0)
+        decompressed = counters.get("bytes_decompressed", 0)
+        return {
+            "counters": dict(counters),
+            "compression_ratio": (
+                round(decompressed / compressed, 2) if compressed else None
+            ),
+        }
@@ -0,0 +1,93 @@
+"""Import of external statistics into the recorder in bounded batches."""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Optional
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models.statistics import (
+    StatisticData,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.core import HomeAssistant
+
+from .const import STATISTICS_BATCH_SIZE
+from .metrics import SyncMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatisticsWriter:
+    """Hands statistics to the recorder at most batch_size at a time.
+
+    After every batch the writer waits until the recorder has worked off its
+    queue, so a large import never holds more than one batch in the queue and
+    other recorder work runs in between. When async_write returns, all its
+    statistics are committed.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        metrics: SyncMetrics,
+        batch_size: int = STATISTICS_BATCH_SIZE,
+    ) -> None:
+        self.hass = hass
+        self.metrics = metrics
+        self.batch_size = batch_size
+        # rows written and seconds spent writing them, for the throughput
+        self.rows = 0
+        self.seconds = 0.0
+        self.last_rate: Optional[float] = None
+
+    async def async_write(
+        self, metadata: StatisticMetaData, statistics: list[StatisticData]
+    ) -> int:
+        """Import statistics batch by batch, returns the number of rows."""
+        recorder = get_instance(self.hass)
+        rows = 0
+        seconds = 0.0
+        for i in range(0, len(statistics), self.batch_size):
+            batch = statistics[i : i + self.batch_size]
+            started = time.monotonic()
+            async_add_external_statistics(self.hass, metadata, batch)
+            await recorder.async_block_till_done()
+            elapsed = time.monotonic() - started
+
+            self.metrics.add_time("write_batch", elapsed)
+            self.metrics.count("statistics_written", len(batch))
+            rows += len(batch)
+            seconds += elapsed
+
+        if rows:
+            self.rows += rows
+            self.seconds += seconds
+            self.last_rate = rows / seconds if seconds else None
+            _LOGGER.debug(
+                "Wrote %s statistics of %s in %.2f s",
+                rows,
+                metadata["statistic_id"],
+                seconds,
+            )
+        return rows
+
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        """Return the throughput over all writes so far."""
+        if not self.seconds:
+            return None
+        return self.rows / self.seconds
+
+    def as_dict(self) -> dict:
+        rate = self.rows_per_second
+        return {
+            "batch_size": self.batch_size,
+            "rows": self.rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(rate) if rate is not None else None,
+            "last_rows_per_second": (
+                round(self.last_rate) if self.last_rate is not None else None
+            ),
+        }
@@ -0,0 +1,26 @@
+"""Tests of the polling schedule."""
+import datetime
+
+from custom_components.stromnetz_graz.scheduler import (
+    DENSE_INTERVAL,
+    MAX_INTERVAL,
+    PollScheduler,
+)
+
+UTC = datetime.timezone.utc
+
+
+def test_long_run_of_empty_polls() -> None:
+    """Weeks without new data keep backing off without overflowing."""
+    scheduler = PollScheduler()
+    now = datetime.datetime(2024, 3, 1, 12, 0, tzinfo=UTC)
+    scheduler.record(1, now, False)
+    now += DENSE_INTERVAL
+    scheduler.record(1, now, True)
+    scheduler.next_interval(now, True)
+
+    for _ in range(1000):
+        interval = scheduler.next_interval(now, False)
+        assert DENSE_INTERVAL <= interval <= MAX_INTERVAL
+        now += interval
+    assert scheduler.next_poll == now